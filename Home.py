@@ -1,6 +1,10 @@
 import streamlit as st
 import json
 import pandas as pd
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from stockalerter.alert_store import get_alert_store
 
 st.set_page_config(
     page_title="Stock Dashboard",
@@ -14,15 +18,9 @@ def format_conditions(conditions):
 def add_stock_alert():
     st.title("Add a New Stock Alert")
 
-# Load alert data from JSON file
+# Load alert data from the alert store (alerts.json or alerts.db)
 def load_alert_data():
-    with open("alerts.json", "r") as file:
-        return json.load(file)
-
-# Save updated alert data to JSON file
-def save_alert_data(alert_data):
-    with open("alerts.json", "w") as file:
-        json.dump(alert_data, file, indent=4)
+    return get_alert_store().load()
 
 alert_data = load_alert_data()
 
@@ -53,9 +51,8 @@ filtered_alerts = sorted(
 )
 
 def delete_alert(alert_id):
-    global alert_data
-    alert_data = [alert for alert in alert_data if alert['alert_id'] != alert_id]
-    save_alert_data(alert_data)
+    # only this alert is removed, alerts saved by other sessions since the page loaded are kept
+    get_alert_store().delete([alert_id])
     st.rerun()
 
 if not filtered_alerts:
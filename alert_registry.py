@@ -0,0 +1,123 @@
+import os
+import threading
+from collections import namedtuple
+from stockalerter.alert_store import get_alert_store
+
+# Seconds between change checks when watching without inotify
+ALERT_REGISTRY_POLL_SECONDS = int(os.getenv("ALERT_REGISTRY_POLL_SECONDS", "60"))
+
+# On Linux (in requirements.txt) the registry reloads as soon as the store is written. Without it,
+# watch() falls back to checking the store's change token every ALERT_REGISTRY_POLL_SECONDS
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+# Alerts added and removed by a reload (an edited alert shows up in both), changed is False when nothing was reloaded
+AlertDiff = namedtuple("AlertDiff", ["added", "removed", "changed"])
+
+NO_CHANGE = AlertDiff([], [], False)
+
+def same_alert(a, b):
+    # last_triggered is run state and the fingerprint is derived, neither is part of the alert's definition
+    if a is None or b is None:
+        return a is b
+    ignored = ('last_triggered', 'fingerprint')
+    return {k: v for k, v in a.items() if k not in ignored} == {k: v for k, v in b.items() if k not in ignored}
+
+
+class AlertRegistry:
+    """
+    The alerts of the alert store kept in memory and indexed by (exchange, timeframe, ticker).
+    \nrefresh() re-reads the store only when its change token moved and returns what changed,
+    lookups never touch the store. version counts the reloads, so a caller can tell whether the alerts
+    changed since it last looked even if someone else refreshed in between.
+    Tickers are indexed upper-case, like check_alerts matches them.
+    """
+    def __init__(self, store=None):
+        self.store = store or get_alert_store()
+        self.lock = threading.Lock()
+        self.signature = None
+        self.version = 0
+        self.alerts = []
+        self.by_id = {}
+        self.by_market = {}
+        self.by_ticker = {}
+        self.refresh()
+
+    def refresh(self, force=False):
+        """
+        Reloads the alerts if the store changed since the last load, returns an AlertDiff
+        """
+        with self.lock:
+            signature = self.store.change_token()
+            if signature == self.signature and not force:
+                return NO_CHANGE
+
+            alerts = self.store.load() if signature is not None else []
+            by_id = {alert['alert_id']: alert for alert in alerts}
+            by_market, by_ticker = {}, {}
+            for alert in alerts:
+                ticker = alert['ticker'].upper()
+                by_market.setdefault((alert['exchange'], alert['timeframe']), {}).setdefault(ticker, []).append(alert)
+                by_ticker.setdefault((alert['timeframe'], ticker), []).append(alert)
+
+            added = [alert for alert_id, alert in by_id.items() if not same_alert(self.by_id.get(alert_id), alert)]
+            removed = [alert for alert_id, alert in self.by_id.items() if not same_alert(by_id.get(alert_id), alert)]
+
+            # swapped in one go, lookups from other threads see either the old or the new index
+            self.alerts, self.by_id, self.by_market, self.by_ticker = alerts, by_id, by_market, by_ticker
+            self.signature = signature
+            self.version += 1
+            return AlertDiff(added, removed, True)
+
+    def all(self):
+        return list(self.alerts)
+
+    def markets(self, timeframe):
+        """
+        Exchanges with at least one alert on the timeframe ("1d" / "1wk")
+        """
+        return {exchange for exchange, tf in self.by_market if tf == timeframe}
+
+    def tickers(self, exchange, timeframe):
+        return {alerts[0]['ticker'] for alerts in self.by_market.get((exchange, timeframe), {}).values()}
+
+    def alerts_for(self, ticker, timeframe, exchange=None):
+        if exchange is None:
+            return list(self.by_ticker.get((timeframe, ticker.upper()), []))
+        return list(self.by_market.get((exchange, timeframe), {}).get(ticker.upper(), []))
+
+    def watch(self, on_change, poll_seconds=None):
+        """
+        Calls on_change(diff) from a daemon thread whenever the alerts change.
+        Uses inotify when inotify_simple is installed, otherwise checks every poll_seconds.
+        """
+        def poll():
+            while True:
+                if INotify is not None:
+                    self._wait_for_write()
+                else:
+                    threading.Event().wait(poll_seconds or ALERT_REGISTRY_POLL_SECONDS)
+                try:
+                    diff = self.refresh()
+                    if diff.changed:
+                        on_change(diff)
+                except Exception as e:
+                    print(f"[Alert Registry] Reload failed: {e}")
+
+        thread = threading.Thread(target=poll, name="alert-registry", daemon=True)
+        thread.start()
+        return thread
+
+    def _wait_for_write(self):
+        # alerts.json is replaced rather than rewritten and SQLite commits land in the -wal file,
+        # so the directory is watched for either
+        if not hasattr(self, "_inotify"):
+            self._inotify = INotify()
+            mask = inotify_flags.CLOSE_WRITE | inotify_flags.MODIFY | inotify_flags.MOVED_TO | inotify_flags.CREATE
+            self._inotify.add_watch(os.path.dirname(os.path.abspath(self.store.path)), mask)
+        name = os.path.basename(self.store.path)
+        names = {name, name + "-wal"}
+        while not any(event.name in names for event in self._inotify.read()):
+            pass
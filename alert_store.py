@@ -0,0 +1,285 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from stockalerter.alert_syntax import canonical_condition, compile_combination
+
+# Legacy alert file, also the source of the JSON importer
+ALERTS_FILE_PATH = "alerts.json"
+
+# SQLite database used by the "sqlite" backend
+ALERTS_DB_PATH = os.getenv("ALERTS_DB_PATH", "alerts.db")
+
+# Backend returned by get_alert_store(), "json" (alerts.json) or "sqlite" (alerts.db)
+ALERT_STORE_BACKEND = os.getenv("ALERT_STORE_BACKEND", "json")
+
+ALERT_FIELDS = ["alert_id", "name", "stock_name", "ticker", "conditions", "combination_logic",
+                "last_triggered", "action", "timeframe", "exchange", "fingerprint"]
+
+
+# FINGERPRINTS
+# Two alerts are duplicates when their fingerprints match, each store keeps them indexed so that
+# save_alert checks for a duplicate with one lookup instead of comparing against every alert
+
+def alert_fingerprint(alert):
+    """
+    Hash of the ticker, exchange, timeframe, conditions and combination logic of an alert.
+    \nConditions are compared without whitespace and the combination logic by its parsed tree,
+    so "rsi(period = 14)[-1] > 70" and "rsi(period=14)[-1]>70" give the same fingerprint
+    """
+    combination = alert.get('combination_logic') or ""
+    try:
+        combination = repr(compile_combination(combination))
+    except ValueError:
+        combination = canonical_condition(combination)
+
+    key = [alert['ticker'], alert['exchange'], alert['timeframe'],
+           [canonical_condition(item['conditions']) for item in alert['conditions']], combination]
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+def with_fingerprint(alert):
+    if alert.get('fingerprint'):
+        return alert
+    return {**alert, 'fingerprint': alert_fingerprint(alert)}
+
+
+# STORE BACKENDS
+# Every backend exposes load / find / add / delete / change_token on alerts as dicts in the alerts.json format
+
+class JsonAlertStore:
+    """
+    The legacy alerts.json file, every write rewrites the whole file.
+    \nThe fingerprint index is rebuilt in memory whenever the file changed since it was last read.
+    Writes hold a lock, so two sessions of the app cannot both pass the duplicate check or drop each other's alerts
+    """
+    def __init__(self, path=ALERTS_FILE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self._fingerprints = {}
+        self._fingerprints_token = None
+
+    def load(self):
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return []
+
+    def _write(self, alerts):
+        # alerts saved before fingerprints existed get theirs on the first write
+        alerts = [with_fingerprint(alert) for alert in alerts]
+        # swapped in atomically, readers never see a half written file
+        with open(self.path + ".tmp", "w") as file:
+            json.dump(alerts, file, indent=4)
+        os.replace(self.path + ".tmp", self.path)
+        self._fingerprints = {alert['fingerprint']: alert['alert_id'] for alert in alerts}
+        self._fingerprints_token = self.change_token()
+
+    def find(self, fingerprint):
+        """
+        alert_id of the alert with this fingerprint, None if there is none
+        """
+        token = self.change_token()
+        if token != self._fingerprints_token:
+            self._fingerprints = {with_fingerprint(alert)['fingerprint']: alert['alert_id'] for alert in self.load()}
+            self._fingerprints_token = token
+        return self._fingerprints.get(fingerprint)
+
+    def add(self, alert):
+        alert = with_fingerprint(alert)
+        with self.lock:
+            if self.find(alert['fingerprint']) is not None:
+                raise ValueError("Alert already exists with the same data fields.")
+            self._write(self.load() + [alert])
+
+    def delete(self, alert_ids):
+        alert_ids = set(alert_ids)
+        with self.lock:
+            alerts = self.load()
+            kept = [alert for alert in alerts if alert['alert_id'] not in alert_ids]
+            self._write(kept)
+        return len(alerts) - len(kept)
+
+    def change_token(self):
+        """
+        Changes whenever the alerts do, None when there is no file yet
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+
+class SqliteAlertStore:
+    """
+    Alerts in a SQLite database in WAL mode, indexed by alert_id, by exchange/timeframe/ticker and by fingerprint.
+    \nAdding or deleting an alert is a single indexed write in its own transaction, so Streamlit
+    sessions and the scheduler can write concurrently without rewriting or clobbering each other's alerts.
+    A version counter bumped by triggers on every change serves as the change token.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS alerts (
+            alert_id TEXT PRIMARY KEY,
+            name TEXT,
+            stock_name TEXT,
+            ticker TEXT NOT NULL,
+            conditions TEXT NOT NULL,
+            combination_logic TEXT,
+            last_triggered TEXT,
+            action TEXT,
+            timeframe TEXT NOT NULL,
+            exchange TEXT NOT NULL,
+            fingerprint TEXT
+        );
+        CREATE INDEX IF NOT EXISTS alerts_market ON alerts (exchange, timeframe, ticker);
+        CREATE INDEX IF NOT EXISTS alerts_ticker ON alerts (ticker);
+
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+
+        CREATE TRIGGER IF NOT EXISTS alerts_inserted AFTER INSERT ON alerts
+            BEGIN UPDATE meta SET value = value + 1 WHERE key = 'version'; END;
+        CREATE TRIGGER IF NOT EXISTS alerts_updated AFTER UPDATE ON alerts
+            BEGIN UPDATE meta SET value = value + 1 WHERE key = 'version'; END;
+        CREATE TRIGGER IF NOT EXISTS alerts_deleted AFTER DELETE ON alerts
+            BEGIN UPDATE meta SET value = value + 1 WHERE key = 'version'; END;
+    """
+
+    def __init__(self, path=ALERTS_DB_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+            self._migrate(conn)
+
+    def _migrate(self, conn):
+        # databases created before fingerprints existed get the column, filled in for every alert
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(alerts)")]
+        if 'fingerprint' not in columns:
+            conn.execute("ALTER TABLE alerts ADD COLUMN fingerprint TEXT")
+            seen = set()
+            for alert in [self._row_to_alert(row) for row in conn.execute(f"SELECT {', '.join(ALERT_FIELDS[:-1])}, NULL FROM alerts")]:
+                fingerprint = alert_fingerprint(alert)
+                # only the first of a set of duplicates gets it, the unique index would reject the rest
+                if fingerprint in seen:
+                    print(f"[Alert Store] Alert {alert['alert_id']} duplicates an earlier alert")
+                    continue
+                seen.add(fingerprint)
+                conn.execute("UPDATE alerts SET fingerprint = ? WHERE alert_id = ?", (fingerprint, alert['alert_id']))
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS alerts_fingerprint ON alerts (fingerprint)")
+
+    @contextmanager
+    def _connect(self):
+        # one short-lived connection per call, sqlite3 connections cannot be shared between threads.
+        # The block runs as one transaction, committed on success and rolled back on error
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _row_to_alert(self, row):
+        alert = dict(zip(ALERT_FIELDS, row))
+        alert['conditions'] = json.loads(alert['conditions'])
+        return alert
+
+    def _alert_to_row(self, alert):
+        row = [with_fingerprint(alert).get(field) for field in ALERT_FIELDS]
+        row[ALERT_FIELDS.index('conditions')] = json.dumps(alert['conditions'])
+        return row
+
+    def load(self):
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT {', '.join(ALERT_FIELDS)} FROM alerts ORDER BY rowid").fetchall()
+        return [self._row_to_alert(row) for row in rows]
+
+    def load_market(self, exchange, timeframe):
+        """
+        Alerts of one market and timeframe, read through the (exchange, timeframe, ticker) index
+        """
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT {', '.join(ALERT_FIELDS)} FROM alerts WHERE exchange = ? AND timeframe = ? ORDER BY rowid",
+                                (exchange, timeframe)).fetchall()
+        return [self._row_to_alert(row) for row in rows]
+
+    def find(self, fingerprint):
+        """
+        alert_id of the alert with this fingerprint, None if there is none
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT alert_id FROM alerts WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        return row[0] if row else None
+
+    def add(self, alert):
+        # the unique fingerprint index also rejects a duplicate saved concurrently by another session
+        try:
+            with self._connect() as conn:
+                conn.execute(f"INSERT INTO alerts ({', '.join(ALERT_FIELDS)}) VALUES ({', '.join('?' * len(ALERT_FIELDS))})",
+                             self._alert_to_row(alert))
+        except sqlite3.IntegrityError as e:
+            if "fingerprint" not in str(e):
+                raise
+            raise ValueError("Alert already exists with the same data fields.")
+
+    def add_many(self, alerts):
+        """
+        Inserts or replaces alerts by alert_id, an alert duplicating another one replaces it
+        """
+        with self._connect() as conn:
+            conn.executemany(f"INSERT OR REPLACE INTO alerts ({', '.join(ALERT_FIELDS)}) VALUES ({', '.join('?' * len(ALERT_FIELDS))})",
+                             [self._alert_to_row(alert) for alert in alerts])
+
+    def delete(self, alert_ids):
+        alert_ids = list(alert_ids)
+        if not alert_ids:
+            return 0
+        with self._connect() as conn:
+            cursor = conn.execute(f"DELETE FROM alerts WHERE alert_id IN ({', '.join('?' * len(alert_ids))})", alert_ids)
+            return cursor.rowcount
+
+    def change_token(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+
+ALERT_STORES = {
+    "json": lambda: JsonAlertStore(ALERTS_FILE_PATH),
+    "sqlite": lambda: SqliteAlertStore(ALERTS_DB_PATH),
+}
+
+# One store per backend and process, so the SQLite schema is set up once
+_stores = {}
+
+def get_alert_store(backend=None):
+    backend = backend or ALERT_STORE_BACKEND
+    if backend not in ALERT_STORES:
+        raise ValueError(f"Unknown alert store backend {backend!r}, expected one of {list(ALERT_STORES)}")
+    if backend not in _stores:
+        _stores[backend] = ALERT_STORES[backend]()
+    return _stores[backend]
+
+
+# ONE-SHOT IMPORT FROM alerts.json
+
+def import_json_alerts(json_path=ALERTS_FILE_PATH, db_path=ALERTS_DB_PATH):
+    """
+    Copies every alert of alerts.json into the SQLite store (alerts already there are replaced), returns the count
+    """
+    alerts = JsonAlertStore(json_path).load()
+    SqliteAlertStore(db_path).add_many(alerts)
+    print(f"Imported {len(alerts)} alerts from {json_path} into {db_path}")
+    return len(alerts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import alerts.json into the SQLite alert store")
+    parser.add_argument("--json", default=ALERTS_FILE_PATH)
+    parser.add_argument("--db", default=ALERTS_DB_PATH)
+    args = parser.parse_args()
+    import_json_alerts(args.json, args.db)
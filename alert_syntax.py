@@ -0,0 +1,128 @@
+from functools import lru_cache
+
+# ALERT SYNTAX
+# Normalization of condition strings and parsing of combination logic, kept free of other
+# stockalerter imports so the alert store (and the Streamlit pages using it) can use them
+# without loading the indicator and provider stack
+
+# Maximum number of distinct compiled condition plans kept in memory
+CONDITION_CACHE_SIZE = 4096
+
+def canonical_condition(cond):
+    """
+    Whitespace-free form of a condition, used as the plan cache key.
+    \n"rsi(period = 14)[-1] > 70" and "rsi(period=14)[-1]>70" share one plan
+    """
+    return "".join(cond.split())
+
+
+# COMBINATION LOGIC
+# combination_logic ("1 and (2 or not 3)") is parsed into a tree of tuples
+#   ("ref", index) | ("not", node) | ("and", (nodes, ...)) | ("or", (nodes, ...))
+# with the usual precedence (not, then and, then or)
+
+COMBINATION_KEYWORDS = ["and", "or", "not"]
+
+def tokenize_combination(expr):
+    """
+    "1 and (2 or 3)" -> [1, 'and', '(', 2, 'or', 3, ')']
+    """
+    tokens = []
+    i = 0
+    while i < len(expr):
+        char = expr[i]
+        if char.isspace():
+            i += 1
+        elif char in "()":
+            tokens.append(char)
+            i += 1
+        elif char.isdigit():
+            start = i
+            while i < len(expr) and expr[i].isdigit():
+                i += 1
+            tokens.append(int(expr[start:i]))
+        elif char.isalpha():
+            start = i
+            while i < len(expr) and expr[i].isalpha():
+                i += 1
+            word = expr[start:i].lower()
+            if word not in COMBINATION_KEYWORDS:
+                raise ValueError(f"Unknown word {expr[start:i]!r} in combination logic {expr!r}, use and / or / not")
+            tokens.append(word)
+        else:
+            raise ValueError(f"Unexpected character {char!r} in combination logic {expr!r}")
+    return tokens
+
+@lru_cache(maxsize=CONDITION_CACHE_SIZE)
+def compile_combination(expr):
+    """
+    Parses combination logic into its tree, an empty string means condition 1 alone
+    """
+    tokens = tokenize_combination(expr) or [1]
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        token = peek()
+        pos += 1
+        return token
+
+    def parse_or():
+        nodes = [parse_and()]
+        while peek() == "or":
+            take()
+            nodes.append(parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", tuple(nodes))
+
+    def parse_and():
+        nodes = [parse_not()]
+        while peek() == "and":
+            take()
+            nodes.append(parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", tuple(nodes))
+
+    def parse_not():
+        if peek() == "not":
+            take()
+            return ("not", parse_not())
+        return parse_atom()
+
+    def parse_atom():
+        token = take()
+        if token == "(":
+            node = parse_or()
+            if take() != ")":
+                raise ValueError(f"Unclosed parenthesis in combination logic {expr!r}")
+            return node
+        if isinstance(token, int):
+            return ("ref", token)
+        raise ValueError(f"Expected a condition number or '(' in combination logic {expr!r}, got {token!r}")
+
+    tree = parse_or()
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected {tokens[pos]!r} in combination logic {expr!r}")
+    return tree
+
+@lru_cache(maxsize=CONDITION_CACHE_SIZE)
+def combination_references(tree):
+    """
+    Condition numbers a combination tree reads
+    """
+    if tree[0] == "ref":
+        return {tree[1]}
+    if tree[0] == "not":
+        return combination_references(tree[1])
+    return set().union(*(combination_references(node) for node in tree[1]))
+
+def validate_combination(expr, count):
+    """
+    Compiles combination logic and checks it only references conditions 1 to count
+    """
+    tree = compile_combination(expr)
+    for idx in combination_references(tree):
+        if not 1 <= idx <= count:
+            raise ValueError(f"Invalid reference: {idx} is out of range (1 to {count})")
+    return tree
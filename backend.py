@@ -1,8 +1,18 @@
 from stockalerter.utils import ops, supported_indicators, inverse_map, period_and_input, period_only, log_to_discord, send_alert
 from stockalerter.indicators_lib import *
-import re
+from stockalerter.price_store import get_price_store
+from stockalerter.streaming import IndicatorStateCache, INDICATOR_STATE_ENABLED
+from stockalerter.alert_registry import AlertRegistry
 import datetime
+import numpy as np
 import pandas as pd
+from collections import namedtuple
+from collections.abc import Mapping
+from functools import lru_cache
+from types import MappingProxyType
+from stockalerter.alert_syntax import (CONDITION_CACHE_SIZE, COMBINATION_KEYWORDS, canonical_condition, tokenize_combination,
+                                      compile_combination, combination_references, validate_combination)
+
 
 def extract_params(s):
     """
@@ -136,14 +146,45 @@ def simplify_conditions(cond, breakout_flag = False):
                 'breakout_flag': breakout_flag
             }
     
-def apply_function(df, ind, vals= None, debug_mode = False):
-    # If it is a flat number, simply return it
-    if 'isNum' in ind and ind['isNum']:
-        return ind['number']
-    
-    if 'isBool' in ind and ind['isBool']:
-        return ind['boolean']
+# SHARED INDICATOR CACHE
+# One dict per DataFrame, mapping indicator_key -> full calculated series, so alerts on the
+# same ticker (and every [-1]/[-2] specifier of one indicator) compute each series once
+
+def indicator_key(ind):
+    """
+    Normalized key of the series an indicator dict describes, the specifier is not part of it.
+    \nmacd(fast_period =12 ,slow_period=26, ...)[-2] and macd(fast_period=12, slow_period=26, ...)[-1] share one key
+    """
+    func = ind['ind']
+    if func in ["Close", "Open", "High", "Low"]:
+        return func
+
+    params = [f"{k}={v}" for k, v in sorted(ind.items()) if k not in ('ind', 'specifier', 'operable', 'input')]
+    source = ind['input'] if isinstance(ind['input'], str) else indicator_key(ind['input'])
+    params.append(f"input={source}")
+    return f"{func}({','.join(params)})"
+
+# Supertrend outputs and the component each one reads from SUPER_TREND_COMPONENTS
+supertrend_family = {
+    "supertrend": "trend",
+    "supertrend_colours": "colours",
+    "supertrend_colour_transitions": "transitions",
+}
 
+def supertrend_components(df, ind, cache = None):
+    """
+    SUPER_TREND_COMPONENTS for the indicator's parameters, stored in the cache under its own key
+    so every member of the supertrend family on a ticker shares one pass over the bars
+    """
+    key = f"supertrend_components(atr_period={ind['atr_period']},multiplier={ind['multiplier']})"
+    components = cache.get(key) if cache is not None else None
+    if components is None:
+        components = SUPER_TREND_COMPONENTS(df, int(ind['atr_period']), float(ind['multiplier']))
+        if cache is not None:
+            cache[key] = components
+    return components
+
+def calculate_series(df, ind, vals = None, debug_mode = False, cache = None):
     func = ind['ind']
 
     if debug_mode:
@@ -176,12 +217,48 @@ def apply_function(df, ind, vals= None, debug_mode = False):
     elif func == "macd":
         calculated = MACD(df,int(ind['fast_period']),int(ind['slow_period']),int(ind['signal_period']), ind['type'])
 
+    elif func == "kalman":
+        calculated = KALMAN(df, int(ind['period']), ind['input'])
+
+    elif func == "kalman_colour_transtitions":
+        calculated = KALMAN_COLOUR_TRANSITIONS(df, int(ind['period']), ind['input'])
+
     elif func == "HARSI_Flip":
         calculated = HARSI_Flip(df, timeperiod=int(ind['period']), smoothing=float(ind['smoothing']))
 
     elif func == "SROCST":
         calculated = SROCST(df, ind['ma_type'], int(ind['lsma_offset']), int(ind['smoothing_length']), ind['kalman_src'], float(ind['sharpness']), float(ind['filter_period']), int(ind['roc_length']), int(ind['k_length']), int(ind['k_smoothing']), int(ind['d_smoothing']))
 
+    elif func in supertrend_family:
+        calculated = supertrend_components(df, ind, cache)[supertrend_family[func]]
+
+    return calculated
+
+def covers(calculated, df, ind):
+    """
+    Whether a cached series can serve ind, streamed entries only hold the last few bars of a series
+    """
+    if len(calculated) == len(df):
+        return True
+    return 'specifier' in ind and -len(calculated) <= int(ind['specifier']) < 0
+
+def apply_function(df, ind, vals= None, debug_mode = False, cache = None):
+    # If it is a flat number, simply return it
+    if 'isNum' in ind and ind['isNum']:
+        return ind['number']
+    
+    if 'isBool' in ind and ind['isBool']:
+        return ind['boolean']
+
+    if cache is None:
+        calculated = calculate_series(df, ind, vals, debug_mode)
+    else:
+        key = indicator_key(ind)
+        if isinstance(cache, IndicatorStateCache):
+            cache.track(key, ind)
+        calculated = cache.get(key)
+        if calculated is None or not covers(calculated, df, ind):
+            calculated = cache[key] = calculate_series(df, ind, vals, debug_mode, cache)
 
     if 'specifier' in ind:
         return calculated.iloc[int(ind['specifier'])]
@@ -191,20 +268,23 @@ def apply_function(df, ind, vals= None, debug_mode = False):
 
     return calculated
 
-def indicator_calculation(df, ind_dict, values = None, debug_mode = False):
+def indicator_calculation(df, ind_dict, values = None, debug_mode = False, cache = None):
     if debug_mode:
-        print(f"at {ind_dict['ind']} and values are {values}, and it is {ind_dict['operable']}")
+        print(f"at {ind_dict.get('ind')} and values are {values}, and it is {ind_dict['operable']}")
 
-    if not ind_dict['operable'] and values is None: #Skips to deepest layer
+    # A cached nested indicator does not need its input series again
+    cached = cache is not None and 'ind' in ind_dict and indicator_key(ind_dict) in cache
+
+    if not ind_dict['operable'] and values is None and not cached: #Skips to deepest layer
         if debug_mode:
             print(f"Going from {ind_dict['ind']} to {ind_dict['input']}")
-        values = indicator_calculation(df, ind_dict['input'], None, debug_mode)
+        values = indicator_calculation(df, ind_dict['input'], None, debug_mode, cache)
 
-    if ind_dict['operable']: #Only triggers at deepest layer
+    if ind_dict['operable'] or cached: #Only triggers at deepest layer
         if debug_mode:
-            print(f"\nreached {ind_dict['input']}")
+            print(f"\nreached {ind_dict.get('input')}")
             print(ind_dict)
-        values = (apply_function(df, ind_dict))
+        values = (apply_function(df, ind_dict, cache=cache))
         return values
     
     if debug_mode:
@@ -213,81 +293,236 @@ def indicator_calculation(df, ind_dict, values = None, debug_mode = False):
     if values is not None: 
         if debug_mode:
             print(f"At {ind_dict['ind']}")
-        values = (apply_function(df, ind_dict, values))
+        values = (apply_function(df, ind_dict, values, cache=cache))
         return values
     
-def evaluate_expression(df, exp, debug_mode=False):
-    exp = simplify_conditions(exp)
-    lhs = indicator_calculation(df, exp['ind1'])
-    rhs = indicator_calculation(df, exp['ind2'])
+# COMPILED CONDITION PLANS
+# A condition string is parsed once into an immutable plan and reused for every evaluation
+
+ConditionPlan = namedtuple("ConditionPlan", ["ind1", "ind2", "comparison", "breakout_flag", "ind1_prev", "ind2_prev"])
+
+def freeze_indicator(ind):
+    """
+    Read-only view of an ind_to_dict result (nested inputs included), so cached plans cannot be mutated
+    """
+    return MappingProxyType({k: freeze_indicator(v) if isinstance(v, dict) else v for k, v in ind.items()})
+
+def shift_specifier(ind, offset):
+    shifted = dict(ind)
+    shifted['specifier'] = str(int(ind['specifier']) + offset)
+    return freeze_indicator(shifted)
+
+@lru_cache(maxsize=CONDITION_CACHE_SIZE)
+def _compile_canonical_condition(cond):
+    exp = simplify_conditions(cond)
+    if exp is None:
+        raise ValueError(f"No comparison operator found in condition {cond!r}")
+
+    ind1 = freeze_indicator(exp['ind1'])
+    ind2 = freeze_indicator(exp['ind2'])
+
+    # breakout needs the same indicators one bar earlier
+    ind1_prev = ind2_prev = None
+    if exp['breakout_flag']:
+        ind1_prev = shift_specifier(ind1, -1)
+        ind2_prev = shift_specifier(ind2, -1)
+
+    return ConditionPlan(ind1, ind2, exp['comparison'], exp['breakout_flag'], ind1_prev, ind2_prev)
+
+def compile_condition(cond):
+    """
+    Returns the cached ConditionPlan for a condition string (plans are passed through unchanged)
+    """
+    if isinstance(cond, ConditionPlan):
+        return cond
+    return _compile_canonical_condition(canonical_condition(cond))
 
-    if debug_mode and not exp['breakout_flag']:
+def evaluate_expression(df, exp, debug_mode=False, cache=None):
+    exp = compile_condition(exp)
+
+    # the cache key leaves out the specifier, so both bars of a breakout (and any indicator
+    # read at several offsets) index one computed series
+    if cache is None:
+        cache = {}
+
+    lhs = indicator_calculation(df, exp.ind1, cache=cache)
+    rhs = indicator_calculation(df, exp.ind2, cache=cache)
+
+    if debug_mode and not exp.breakout_flag:
         print(f"LHS is {lhs} \nRHS is {rhs}")
 
-    op = exp['comparison']
-    if not exp['breakout_flag']:
+    op = exp.comparison
+    if not exp.breakout_flag:
         return bool(ops[op](lhs,rhs))
     
-    # if breakout is there, we need to calculate yesterdays lhs and rhs too
-    exp['ind1']['specifier'] = str(int(exp['ind1']['specifier'])-1)
-    exp['ind2']['specifier'] = str(int(exp['ind2']['specifier'])-1)
-
-    lhs_yest = indicator_calculation(df, exp['ind1'])
-    rhs_yest = indicator_calculation(df, exp['ind2'])
+    # if breakout is there, we need yesterdays lhs and rhs too, read from the series computed above
+    lhs_yest = indicator_calculation(df, exp.ind1_prev, cache=cache)
+    rhs_yest = indicator_calculation(df, exp.ind2_prev, cache=cache)
 
     if debug_mode:
         print(f"LHS is {lhs} \nRHS is {rhs} \nLHS_yest is {lhs_yest} \nRHS_yest is {rhs_yest}\nExpression: {lhs}{op}{rhs}")
 
-    return bool(ops[op](lhs,rhs) and ops[inverse_map(op)](lhs_yest,rhs_yest))
+    return bool(ops[op](lhs,rhs) and ops[inverse_map[op]](lhs_yest,rhs_yest))
 
-def validate_referenced_indices(expr, bools):
-    import re
-    referenced = set(int(num) for num in re.findall(r'\b\d+\b', expr))
-    for idx in referenced:
-        if not 1 <= idx <= len(bools):
-            raise ValueError(f"Invalid reference: {idx} is out of range (1 to {len(bools)})")
-    return referenced
+# COMPILED COMBINATION LOGIC
+# combination_logic ("1 and (2 or not 3)") is parsed once into a tree of tuples
+#   ("ref", index) | ("not", node) | ("and", (nodes, ...)) | ("or", (nodes, ...))
+# with the usual precedence (not, then and, then or) and evaluated without eval.
+# Parsing lives in alert_syntax, shared with the alert store's fingerprints
 
-def evaluate_boolean_expression(expr, bools):
-    # Find all standalone numbers in the expression
-    referenced = set(int(num) for num in re.findall(r'\b\d+\b', expr))
-
-    # Replace each number with a variable like var_1, var_2, etc.
-    for i in sorted(referenced, reverse=True):  # biggest to smallest to avoid partials
-        expr = re.sub(rf'\b{i}\b', f'var_{i}', expr)
-
-    context = {f'var_{i+1}': val for i, val in enumerate(bools)}
-    
-    return eval(expr, {}, context)
+def evaluate_combination(tree, values):
+    """
+    Evaluates a combination tree on condition results, python bools or numpy bool arrays (one value per bar)
+    """
+    kind = tree[0]
+    if kind == "ref":
+        return values[tree[1] - 1]
+    if kind == "not":
+        value = evaluate_combination(tree[1], values)
+        return ~value if isinstance(value, np.ndarray) else not value
+
+    operands = [evaluate_combination(node, values) for node in tree[1]]
+    if any(isinstance(value, np.ndarray) for value in operands):
+        reduce = np.logical_and.reduce if kind == "and" else np.logical_or.reduce
+        return reduce(operands)
+    return all(operands) if kind == "and" else any(operands)
 
+def validate_referenced_indices(expr, bools):
+    return combination_references(validate_combination(expr, len(bools)))
 
-def evaluate_expression_list(df, exps, combination = '1'):
+def evaluate_boolean_expression(expr, bools):
+    return evaluate_combination(validate_combination(expr, len(bools)), bools)
+
+
+# EVALUATION COST
+# Rough cost of computing each indicator's series, in units of one talib pass over the history
+# (measured on 3000 daily bars). Conditions joined by and/or are tried cheapest first, so a cheap false
+# condition skips an expensive one. Series already in the cache cost nothing.
+
+INDICATOR_COSTS = {
+    "Close": 0, "Open": 0, "High": 0, "Low": 0,
+    "sma": 1, "ema": 1, "rsi": 1, "roc": 1, "atr": 1, "williamsr": 1, "sar": 1, "bbands": 1,
+    "cci": 2, "macd": 2, "slope_sma": 2, "slope_ema": 2,
+    "hma": 3, "slope_hma": 4,
+    "HARSI_Flip": 7,
+    "supertrend": 20, "supertrend_colours": 20, "supertrend_colour_transitions": 20,
+    "SROCST": 25,
+    "kalman": 5000, "kalman_colour_transtitions": 5000,
+}
+
+# Cost of indicators missing from the table
+DEFAULT_INDICATOR_COST = 10
+
+def indicator_cost(ind, cache = None):
+    if ind.get('isNum') or ind.get('isBool'):
+        return 0
+    if cache is not None and indicator_key(ind) in cache:
+        return 0
+
+    cost = INDICATOR_COSTS.get(ind['ind'], DEFAULT_INDICATOR_COST)
+    if isinstance(ind.get('input'), Mapping):
+        cost += indicator_cost(ind['input'], cache)
+    return cost
+
+def condition_cost(plan, cache = None):
+    # a breakout reads the same two series at a second bar, which costs nothing more
+    return indicator_cost(plan.ind1, cache) + indicator_cost(plan.ind2, cache)
+
+def combination_cost(tree, costs):
+    return sum(costs[idx] for idx in combination_references(tree))
+
+def evaluate_combination_lazily(tree, condition, costs):
+    """
+    Evaluates a combination tree calling condition(index) only for the conditions it needs.
+    \nThe operands of and/or are tried in order of cost (costs maps condition index -> cost)
+    and stop at the first one deciding the result
+    """
+    kind = tree[0]
+    if kind == "ref":
+        return condition(tree[1])
+    if kind == "not":
+        return not evaluate_combination_lazily(tree[1], condition, costs)
+
+    for node in sorted(tree[1], key=lambda node: combination_cost(node, costs)):
+        value = evaluate_combination_lazily(node, condition, costs)
+        if kind == "and" and not value:
+            return False
+        if kind == "or" and value:
+            return True
+    return kind == "and"
+
+def explain_evaluation(exps, combination = '1', cache = None):
+    """
+    Human readable evaluation plan: the cost of every condition and the order they are tried in
+    """
+    plans = [compile_condition(exp) for exp in exps]
+    tree = validate_combination(combination, len(plans))
+    costs = {idx: condition_cost(plans[idx - 1], cache) for idx in range(1, len(plans) + 1)}
+
+    def render(node):
+        if node[0] == "ref":
+            return str(node[1])
+        if node[0] == "not":
+            return f"not {render(node[1])}"
+        ordered = sorted(node[1], key=lambda child: combination_cost(child, costs))
+        return "(" + f" {node[0]} ".join(render(child) for child in ordered) + ")"
+
+    lines = [f"Order: {render(tree)}"]
+    for idx, exp in enumerate(exps, start=1):
+        text = exp if isinstance(exp, str) else repr(exp)
+        lines.append(f"  {idx}: cost {costs[idx]:<5} {text}")
+    return "\n".join(lines)
+
+def evaluate_expression_list(df, exps, combination = '1', cache = None):
     """
     Wrapper on whole backend
-    \nAccepts a list of expressions and combination logic, outputs a boolean value
+    \nAccepts a list of expressions (strings or compiled plans) and combination logic, outputs a boolean value
+    \nConditions are evaluated lazily through the combination logic, cheapest first (see explain_evaluation)
+    \nPass the same cache dict for every call on one DataFrame to share indicator series between them
     """
-    bools = []
-    for exp in exps:
-        bools.append(evaluate_expression(df, exp))
+    plans = [compile_condition(exp) for exp in exps]
+    if cache is None:
+        cache = {}
+    tree = validate_combination(combination, len(plans))
+    costs = {idx: condition_cost(plans[idx - 1], cache) for idx in combination_references(tree)}
+
+    results = {}
+    def condition(idx):
+        if idx not in results:
+            results[idx] = bool(evaluate_expression(df, plans[idx - 1], cache=cache))
+        return results[idx]
 
-    return evaluate_boolean_expression(combination,bools)
+    return evaluate_combination_lazily(tree, condition, costs)
 
 
 
-def check_alerts(stock, alert_data,timeframe):
+def alerts_for_stock(stock, alert_data, timeframe):
     """
+    The alerts of alert_data (a list or an AlertRegistry) on stock for the store timeframe ("daily" / "weekly")
+    """
+    # Filter alerts for this stock (case-insensitive ticker match)
+    alert_timeframe = "1d" if timeframe == "daily" else "1wk"
+    if isinstance(alert_data, AlertRegistry):
+        return alert_data.alerts_for(stock, alert_timeframe)
+    return [alert for alert in alert_data if alert['ticker'].upper() == stock.upper() and alert['timeframe'] == alert_timeframe]
+
+def check_alerts(stock, alert_data,timeframe, notify=send_alert):
+    """
+    Evaluates every alert on stock for the timeframe, calling notify(stock, alert, condition, df) for each triggered one
+    \nalert_data is a list of alerts or an AlertRegistry, which finds the ticker's alerts without scanning them all
     """
     
-    file_path = f"data/{stock}_{timeframe}.csv"
-    df = pd.read_csv(file_path)
+    df = get_price_store().load(stock, timeframe)
     
-    if df.empty:
+    if df is None or df.empty:
         print(f"[Alert Check] No data for {stock}, skipping alert check.")
         return
 
-    # Filter alerts for this stock (case-insensitive ticker match)
-    alert_timeframe = "1d" if timeframe == "daily" else "1wk"
-    alerts = [alert for alert in alert_data if alert['ticker'].upper() == stock.upper() and alert['timeframe'] == alert_timeframe]
+    alerts = alerts_for_stock(stock, alert_data, timeframe)
+
+    # Every alert for this ticker shares one indicator cache, so each series is computed once per run,
+    # and streamed indicators start out with their last outputs from the persisted state
+    indicator_cache = IndicatorStateCache(stock, timeframe, df) if INDICATOR_STATE_ENABLED else {}
     
     for alert in alerts:
             
@@ -299,16 +534,19 @@ def check_alerts(stock, alert_data,timeframe):
             condition = [item['conditions'] for item in alert['conditions']]
             print(condition)
             comb_logic = alert['combination_logic']
-            result = evaluate_expression_list(df = df, exps = condition, combination='1' if len(comb_logic)==0 else comb_logic)
+            result = evaluate_expression_list(df = df, exps = condition, combination='1' if len(comb_logic)==0 else comb_logic, cache = indicator_cache)
             
             print(f"Result: {result}")
             log_to_discord(f"Evaluating alert '{alert['name']}' for {stock}: condition '{condition}' evaluated to {result} at {datetime.datetime.now().strftime('%d-%m-%Y %H:%M:%S')}.")
 
             if result:
                 # Send alert via Discord
-                send_alert(stock, alert, condition[0], df)
+                notify(stock, alert, condition[0], df)
                 log_to_discord(f"[Alert Check] Alert '{alert['name']}' triggered for {stock} with condition '{condition[0]}'.")
                 # Update last triggered time
                 alert["last_triggered"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             else:
                 log_to_discord(f"[Alert Check] Alert '{alert['name']}' not triggered for {stock}.")
+
+    if isinstance(indicator_cache, IndicatorStateCache):
+        indicator_cache.save()
@@ -0,0 +1,124 @@
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from stockalerter.backend import compile_condition, indicator_calculation, validate_combination, evaluate_combination
+from stockalerter.price_store import get_price_store, timestamps_to_dates, TIMESTAMP_COLUMN
+from stockalerter.utils import ops, inverse_map, load_alert_data
+
+# Alert timeframes and the price store timeframe holding their bars
+STORE_TIMEFRAMES = {"1d": "daily", "1wk": "weekly"}
+
+# VECTORIZED CONDITIONS
+# A condition is evaluated at every bar at once: each side's series is computed once over the
+# whole history and shifted so that position t holds what [-k] would have read with bar t as the last bar.
+# Indicators only looking back (everything talib based, HARSI, SROCST, Kalman, Supertrend) give the same
+# values a live check on the history up to t would; slope_* use central differences, so their last bar peeks one ahead.
+
+def values_at_bars(df, ind, cache=None):
+    """
+    Value of ind at every bar as a numpy array (numbers and bools stay scalars)
+    """
+    if ind.get('isNum') or ind.get('isBool'):
+        return indicator_calculation(df, ind, cache=cache)
+
+    series_ind = {k: v for k, v in ind.items() if k != 'specifier'}
+    series = pd.Series(np.asarray(indicator_calculation(df, series_ind, cache=cache)))
+
+    specifier = int(ind['specifier'])
+    if specifier >= 0:
+        # an absolute bar only exists once the history reaches it
+        values = pd.Series(series.iloc[specifier], index=series.index)
+        return values.where(series.index >= specifier).to_numpy()
+    return series.shift(-1 - specifier).to_numpy()
+
+def condition_at_bars(df, cond, cache=None):
+    """
+    Boolean array of a condition string at every bar of df, breakout(...) included
+    """
+    plan = compile_condition(cond)
+    lhs = values_at_bars(df, plan.ind1, cache)
+    rhs = values_at_bars(df, plan.ind2, cache)
+    result = np.broadcast_to(np.asarray(ops[plan.comparison](lhs, rhs), dtype=bool), (len(df),))
+
+    if plan.breakout_flag:
+        lhs_yest = values_at_bars(df, plan.ind1_prev, cache)
+        rhs_yest = values_at_bars(df, plan.ind2_prev, cache)
+        result = result & np.asarray(ops[inverse_map[plan.comparison]](lhs_yest, rhs_yest), dtype=bool)
+    return result
+
+# BACKTESTS
+
+def backtest_alert(alert, df, cache=None):
+    """
+    Every bar of df at which the alert would have triggered.
+    \nReturns a dict with the alert name, ticker, timeframe, the number of bars, the trigger bar
+    positions and dates, and the seconds spent evaluating.
+    """
+    start = time.perf_counter()
+    conditions = [condition_at_bars(df, item['conditions'], cache) for item in alert['conditions']]
+    combination = validate_combination(alert['combination_logic'], len(conditions))
+    triggered = np.flatnonzero(np.broadcast_to(evaluate_combination(combination, conditions), (len(df),)))
+
+    return {
+        "name": alert['name'],
+        "ticker": alert['ticker'],
+        "timeframe": alert['timeframe'],
+        "bars": len(df),
+        "triggers": triggered.tolist(),
+        "trigger_dates": list(timestamps_to_dates(df[TIMESTAMP_COLUMN].to_numpy()[triggered])),
+        "seconds": time.perf_counter() - start,
+    }
+
+def backtest_alerts(alerts=None, store=None):
+    """
+    Backtests every alert (all of alerts.json by default) on its stored history.
+    Alerts on one ticker and timeframe share the history and the indicator cache.
+    \nReturns (results, seconds), alerts without stored history are skipped.
+    """
+    alerts = load_alert_data() if alerts is None else alerts
+    store = store or get_price_store()
+    start = time.perf_counter()
+
+    groups = {}
+    for alert in alerts:
+        groups.setdefault((alert['ticker'], alert['timeframe']), []).append(alert)
+
+    results = []
+    for (ticker, timeframe), group in groups.items():
+        df = store.load(ticker, STORE_TIMEFRAMES.get(timeframe, timeframe))
+        if df is None or df.empty:
+            print(f"[Backtest] No stored data for {ticker} ({timeframe}), skipping {len(group)} alert(s)")
+            continue
+
+        cache = {}
+        for alert in group:
+            try:
+                results.append(backtest_alert(alert, df, cache))
+            except Exception as e:
+                print(f"[Backtest] Alert '{alert['name']}' on {ticker} failed: {e}")
+
+    return results, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate saved alerts over the whole stored history")
+    parser.add_argument("--ticker", help="only backtest alerts on this ticker")
+    parser.add_argument("--name", help="only backtest alerts with this name")
+    parser.add_argument("--json", action="store_true", help="print the full results as JSON")
+    args = parser.parse_args()
+
+    alerts = [alert for alert in load_alert_data()
+              if (args.ticker is None or alert['ticker'].upper() == args.ticker.upper())
+              and (args.name is None or alert['name'] == args.name)]
+    results, seconds = backtest_alerts(alerts)
+
+    if args.json:
+        print(json.dumps({"seconds": seconds, "results": results}, indent=4))
+    else:
+        for result in results:
+            last = result['trigger_dates'][-1] if result['trigger_dates'] else "never"
+            print(f"{result['ticker']:<8} {result['timeframe']:<4} {result['name']}: "
+                  f"{len(result['triggers'])} trigger(s) over {result['bars']} bars, last {last} ({result['seconds'] * 1000:.1f} ms)")
+        print(f"Backtested {len(results)} alert(s) in {seconds:.2f}s")
@@ -0,0 +1,318 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from stockalerter import utils
+from stockalerter.utils import supported_indicators
+from stockalerter.backend import check_alerts, compile_condition, evaluate_expression
+from stockalerter.alert_store import JsonAlertStore
+from stockalerter.alert_registry import AlertRegistry
+from stockalerter.price_store import get_price_store, TIMESTAMP_COLUMN
+from stockalerter.streaming import INDICATOR_STATE_ENABLED
+
+# Defaults of a full run, --quick shrinks them for a smoke test
+BENCHMARK_BARS = 5000
+BENCHMARK_TICKERS = 100
+BENCHMARK_ALERT_COUNTS = [1000, 10000]
+BENCHMARK_REPEAT = 20
+
+
+# SYNTHETIC DATA
+# Everything is drawn from a seeded generator, so two runs (and two commits) see the same prices and alerts
+
+def synthetic_ohlcv(bars=BENCHMARK_BARS, seed=0, gaps=0.0):
+    """
+    A geometric random walk in the price store layout (int64 Date column, float64 OHLCV).
+    \ngaps is the share of bars that follow a skipped session and open away from the previous close,
+    like the gaps after holidays and earnings.
+    """
+    rng = np.random.default_rng(seed)
+    gapped = rng.random(bars) < gaps
+    gapped[0] = False
+
+    returns = rng.normal(0.0003, 0.015, bars)
+    opening = np.where(gapped, rng.normal(0, 0.04, bars), rng.normal(0, 0.003, bars))
+    close = 100 * np.exp(np.cumsum(returns + opening))
+    open_ = close / np.exp(returns)
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.006, bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.006, bars)))
+    volume = rng.integers(100_000, 5_000_000, bars).astype("float64")
+
+    # a gapped bar comes one extra business day after the previous one
+    days = np.cumsum(1 + gapped)
+    dates = pd.bdate_range("1990-01-01", periods=int(days[-1]) + 1)[days]
+
+    return pd.DataFrame({
+        TIMESTAMP_COLUMN: dates.asi8,
+        "Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume,
+    })
+
+# Condition templates the synthetic alerts draw from, {p} / {q} are periods with p < q
+ALERT_CONDITIONS = [
+    "rsi(period={p})[-1] > 70",
+    "rsi(period={p})[-1] < 30",
+    "sma(period={p})[-1] > sma(period={q})[-1]",
+    "ema(period={p})[-1] < ema(period={q})[-1]",
+    "Close[-1] > hma(period={q})[-1]",
+    "breakout(sma(period={p})[-1] > sma(period={q})[-1])",
+    "macd(fast_period={p}, slow_period={q}, signal_period=9, type=line)[-1] > macd(fast_period={p}, slow_period={q}, signal_period=9, type=signal)[-1]",
+    "bbands(period={p}, std_dev=2, type=upper)[-1] < Close[-1]",
+    "atr(period={p})[-1] > atr(period={q})[-1]",
+    "cci(period={p})[-1] > 100",
+    "williamsr(period={p})[-1] < -80",
+    "roc(period={p})[-1] > 0",
+    "sma(period={p}, input=rsi(period={q}))[-1] > 50",
+]
+
+def synthetic_alerts(count, tickers, seed=0):
+    """
+    count alerts spread over the tickers, each with one to three conditions joined by and / or
+    """
+    rng = np.random.default_rng(seed)
+    alerts = []
+    for i in range(count):
+        conditions = []
+        for index in range(1, int(rng.integers(1, 4)) + 1):
+            p = int(rng.integers(5, 30))
+            q = p + int(rng.integers(5, 60))
+            template = ALERT_CONDITIONS[int(rng.integers(len(ALERT_CONDITIONS)))]
+            conditions.append({"index": index, "conditions": template.format(p=p, q=q)})
+        joiners = rng.choice(["and", "or"], len(conditions) - 1)
+        combination = " ".join([str(1)] + [f"{j} {n}" for j, n in zip(joiners, range(2, len(conditions) + 1))])
+        ticker = tickers[i % len(tickers)]
+        alerts.append({
+            "alert_id": f"bench-{i}", "name": f"Benchmark {i}", "stock_name": ticker, "ticker": ticker,
+            "conditions": conditions, "combination_logic": combination, "last_triggered": None,
+            "action": "Buy" if i % 2 else "Sell", "timeframe": "1d", "exchange": "US",
+        })
+    return alerts
+
+
+# MEASUREMENT
+
+def measure(name, func, repeat=BENCHMARK_REPEAT, warmup=1, setup=None):
+    """
+    Times repeat calls of func (setup runs before each call, untimed) and one more call under tracemalloc.
+    \nReturns a dict with ops/sec, mean / p50 / p99 milliseconds and the peak traced memory in KiB,
+    or with the error when func raises, so one broken scenario does not stop the run.
+    """
+    try:
+        return _measure(name, func, repeat, warmup, setup)
+    except Exception as e:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        return {"name": name, "error": f"{type(e).__name__}: {e}"}
+
+def _measure(name, func, repeat, warmup, setup):
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    # traced separately, tracemalloc slows allocations down too much to time under it
+    if setup:
+        setup()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    times = np.array(times)
+    return {
+        "name": name,
+        "runs": repeat,
+        "ops_per_sec": float(1 / times.mean()),
+        "mean_ms": float(times.mean() * 1000),
+        "p50_ms": float(np.percentile(times, 50) * 1000),
+        "p99_ms": float(np.percentile(times, 99) * 1000),
+        "peak_kib": peak / 1024,
+    }
+
+@contextlib.contextmanager
+def quiet():
+    # check_alerts prints and buffers Discord log lines for every alert
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            yield
+        finally:
+            utils.LOG_BUFFER.clear()
+
+
+# SCENARIOS
+
+# Arguments every supported_indicators entry is benchmarked with, after the frame
+INDICATOR_ARGS = {
+    "sma": (50, "Close"), "ema": (50, "Close"), "hma": (50, "Close"),
+    "slope_sma": (50, "Close"), "slope_ema": (50, "Close"), "slope_hma": (50, "Close"),
+    "rsi": (14, "Close"), "atr": (14,), "cci": (20,), "bb": (20, 2.0, "upper"), "roc": (12, "Close"),
+    "williamsr": (14,), "macd": (12, 26, 9, "line"), "psar": (0.02, 0.2),
+    "HARSI_Flip": (14, 7.0),
+    "SROCST": ("EMA", 0, 12, "Close", 25.0, 1.0, 9, 14, 1, 3),
+    "kalman": (20, "Close"), "kalman_colours": (20, "Close"), "kalman_colour_transtitions": (20, "Close"),
+    "supertrend": (10, 3.0), "supertrend_colours": (10, 3.0), "supertrend_colour_transitions": (10, 3.0),
+}
+
+# Indicators too slow to call BENCHMARK_REPEAT times on a long history
+SLOW_INDICATORS = {"kalman", "kalman_colours", "kalman_colour_transtitions"}
+
+EXPRESSIONS = {
+    "expression:simple": "rsi(period=14)[-1] > 70",
+    "expression:two_series": "sma(period=20)[-1] > sma(period=50)[-1]",
+    "expression:nested": "sma(period=30, input=rsi(period=14, input=ema(period=55)))[-1] > 50",
+    "expression:breakout": "breakout(sma(period=20)[-1] > sma(period=50)[-1])",
+    "expression:breakout_nested": "breakout(ema(period=10, input=rsi(period=14))[-1] > 50)",
+}
+
+def indicator_scenarios(df, repeat):
+    for name, func in supported_indicators.items():
+        args = INDICATOR_ARGS[name]
+        yield measure(f"indicator:{name}", lambda: func(df, *args), repeat=max(1, repeat // 10) if name in SLOW_INDICATORS else repeat)
+
+def expression_scenarios(df, repeat):
+    for name, condition in EXPRESSIONS.items():
+        plan = compile_condition(condition)
+        # a fresh cache per call, so every run computes the series
+        yield measure(name, lambda: evaluate_expression(df, plan, cache={}), repeat=repeat)
+
+def check_alerts_scenarios(workdir, bars, tickers, gaps, alert_counts, repeat):
+    """
+    check_alerts over every ticker for 1k / 10k alerts, run from a scratch directory holding the
+    synthetic price store and alerts. cold starts without persisted indicator state, warm reuses it.
+    """
+    names = [f"BENCH{i}" for i in range(tickers)]
+    store = get_price_store(data_dir=os.path.join(workdir, "data"))
+    for i, ticker in enumerate(names):
+        store.save(ticker, "daily", synthetic_ohlcv(bars, seed=i, gaps=gaps))
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        for count in alert_counts:
+            alert_store = JsonAlertStore(os.path.join(workdir, f"alerts_{count}.json"))
+            alert_store._write(synthetic_alerts(count, names))
+            registry = AlertRegistry(alert_store)
+
+            def run():
+                with quiet():
+                    for ticker in names:
+                        check_alerts(ticker, registry, "daily", notify=lambda *args: None)
+
+            def clear_state():
+                for file in os.listdir("data"):
+                    if file.endswith(".indicators.json"):
+                        os.remove(os.path.join("data", file))
+
+            runs = max(1, repeat // 10)
+            yield measure(f"check_alerts:{count}:cold", run, repeat=runs, warmup=0, setup=clear_state)
+            if INDICATOR_STATE_ENABLED:
+                yield measure(f"check_alerts:{count}:warm", run, repeat=runs)
+    finally:
+        os.chdir(cwd)
+
+
+# RUNNER
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_benchmarks(bars=BENCHMARK_BARS, tickers=BENCHMARK_TICKERS, gaps=0.01, alert_counts=None,
+                   repeat=BENCHMARK_REPEAT, only=None):
+    """
+    Runs every scenario whose name contains only (all by default), returns the report as a dict
+    """
+    alert_counts = BENCHMARK_ALERT_COUNTS if alert_counts is None else alert_counts
+    df = synthetic_ohlcv(bars, seed=0, gaps=gaps)
+    workdir = tempfile.mkdtemp(prefix="stockalerter-bench-")
+
+    groups = [
+        ([f"indicator:{name}" for name in supported_indicators], lambda: indicator_scenarios(df, repeat)),
+        (list(EXPRESSIONS), lambda: expression_scenarios(df, repeat)),
+        ([f"check_alerts:{count}:{state}" for count in alert_counts for state in ("cold", "warm")],
+         lambda: check_alerts_scenarios(workdir, bars, tickers, gaps, alert_counts, repeat)),
+    ]
+    results = []
+    try:
+        for names, scenarios in groups:
+            # a group is only set up (price store, alert books) when one of its scenarios is wanted
+            if only and not any(only in name for name in names):
+                continue
+            for result in scenarios():
+                if only is not None and only not in result["name"]:
+                    continue
+                if "error" in result:
+                    print(f"{result['name']:<45} failed: {result['error']}")
+                else:
+                    print(f"{result['name']:<45} {result['ops_per_sec']:>12.2f} ops/s  p50 {result['p50_ms']:>10.3f} ms  "
+                          f"p99 {result['p99_ms']:>10.3f} ms  peak {result['peak_kib']:>10.1f} KiB")
+                results.append(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "config": {"bars": bars, "tickers": tickers, "gaps": gaps, "alert_counts": alert_counts, "repeat": repeat},
+        "results": results,
+    }
+
+def compare_reports(baseline, current):
+    """
+    Ratio of current to baseline ops/sec per scenario present in both, below 1 is a slowdown
+    """
+    before = {result["name"]: result for result in baseline["results"] if "error" not in result}
+    return {result["name"]: result["ops_per_sec"] / before[result["name"]]["ops_per_sec"]
+            for result in current["results"] if result["name"] in before and "error" not in result}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the indicators and the alert evaluation engine")
+    parser.add_argument("--bars", type=int, default=BENCHMARK_BARS, help="bars of synthetic history per ticker")
+    parser.add_argument("--tickers", type=int, default=BENCHMARK_TICKERS, help="tickers the synthetic alerts are spread over")
+    parser.add_argument("--gaps", type=float, default=0.01, help="share of bars opening after a skipped session")
+    parser.add_argument("--alerts", type=int, nargs="*", default=BENCHMARK_ALERT_COUNTS, help="alert book sizes for check_alerts")
+    parser.add_argument("--repeat", type=int, default=BENCHMARK_REPEAT, help="timed runs per scenario")
+    parser.add_argument("--only", help="only run scenarios whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="small sizes for a smoke test")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare ops/sec against")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.bars, args.tickers, args.alerts, args.repeat = 1000, 10, [100], 5
+
+    report = run_benchmarks(args.bars, args.tickers, args.gaps, args.alerts, args.repeat, args.only)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+        print(f"Wrote {len(report['results'])} result(s) to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            ratios = compare_reports(json.load(file), report)
+        for name, ratio in ratios.items():
+            flag = "  <-- slower" if ratio < 0.9 else ""
+            print(f"{name:<45} {ratio:>6.2f}x{flag}")
@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+import requests
+from stockalerter.http_pool import get_http_session
+
+# Undelivered messages, written on every change so a restart picks up where delivery stopped.
+# Keyed by the environment variable holding each webhook, the URLs carry their tokens and stay out of the file
+DISCORD_SPOOL_PATH = os.getenv("DISCORD_SPOOL_PATH", os.path.join("data", "discord_spool.json"))
+
+# Seconds before a webhook request is abandoned and retried
+DISCORD_TIMEOUT = float(os.getenv("DISCORD_TIMEOUT", "10"))
+
+# Longest wait between retries after network errors or 5xx responses
+DISCORD_MAX_BACKOFF = 60
+
+
+# RATE LIMITS
+# Discord answers every webhook post with its bucket state, a 429 carries how long to back off
+
+def retry_after(response):
+    """
+    Seconds to wait before retrying a 429, from Retry-After or the JSON body
+    """
+    header = response.headers.get("Retry-After")
+    if header is not None:
+        return float(header)
+    try:
+        return float(response.json().get("retry_after", 1))
+    except ValueError:
+        return 1.0
+
+def bucket_wait(response):
+    """
+    Seconds to wait before the next post to this webhook, 0 while the bucket has requests left
+    """
+    if response.headers.get("X-RateLimit-Remaining") != "0":
+        return 0.0
+    return float(response.headers.get("X-RateLimit-Reset-After", 1))
+
+
+# DELIVERY WORKER
+
+class DiscordDelivery:
+    """
+    Posts webhook payloads from a background queue so callers never wait on Discord.
+    \nEvery webhook gets its own worker thread, so both channels are posted to concurrently while
+    each one keeps its messages in order. Waits come from Discord's rate limit headers instead of
+    fixed sleeps, failed posts are retried with backoff, and pending payloads are spooled to disk.
+    \nWebhooks are named by their environment variable ("WEBHOOK_URL_LOGGING"), resolve turns a name into its URL.
+    """
+    def __init__(self, spool_path=DISCORD_SPOOL_PATH, post=None, resolve=os.getenv):
+        self.spool_path = spool_path
+        # posts share the pooled keep-alive session instead of a new connection (and TLS handshake) each
+        self.post = post or (lambda url, payload: get_http_session().post(url, json=payload, timeout=DISCORD_TIMEOUT))
+        self.resolve = resolve
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.wakeups = {}
+        self.workers = {}
+        for webhook, payloads in self._load_spool().items():
+            if not self.resolve(webhook):
+                print(f"[Discord] {webhook} is not set, dropping {len(payloads)} spooled message(s)")
+                continue
+            self.pending[webhook] = deque(payloads)
+            self._start(webhook)
+
+    def _load_spool(self):
+        if not os.path.exists(self.spool_path):
+            return {}
+        try:
+            with open(self.spool_path, "r") as file:
+                spool = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"[Discord] Discarding unreadable spool {self.spool_path}: {e}")
+            return {}
+        if spool:
+            print(f"[Discord] Resuming delivery of {sum(len(p) for p in spool.values())} spooled message(s)")
+        return spool
+
+    def _save_spool(self):
+        # called with the lock held
+        os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+        with open(self.spool_path + ".tmp", "w") as file:
+            json.dump({webhook: list(payloads) for webhook, payloads in self.pending.items() if payloads}, file)
+        os.replace(self.spool_path + ".tmp", self.spool_path)
+
+    def _start(self, webhook):
+        # called with the lock held, or from __init__
+        if webhook in self.workers:
+            return
+        self.wakeups[webhook] = threading.Event()
+        self.workers[webhook] = threading.Thread(target=self._run, args=(webhook,), name=f"discord-{webhook}", daemon=True)
+        self.workers[webhook].start()
+
+    def send(self, webhook, payloads):
+        """
+        Queues payloads for a webhook (the name of its environment variable) and returns at once,
+        a webhook without a URL is ignored
+        """
+        if not payloads or not self.resolve(webhook):
+            return
+        with self.lock:
+            self.pending.setdefault(webhook, deque()).extend(payloads)
+            self._save_spool()
+            self._start(webhook)
+            self.wakeups[webhook].set()
+
+    def _run(self, webhook):
+        backoff = 1
+        while True:
+            with self.lock:
+                payload = self.pending[webhook][0] if self.pending[webhook] else None
+                if payload is None:
+                    self.wakeups[webhook].clear()
+            if payload is None:
+                self.wakeups[webhook].wait()
+                continue
+
+            # anything unexpected (a malformed header, a failing post) is retried rather than killing the worker
+            try:
+                wait = self._deliver(webhook, payload)
+            except requests.exceptions.RequestException as e:
+                print(f"[Discord] {webhook}: post failed, retrying in {backoff}s: {e}")
+                wait = None
+            except Exception as e:
+                print(f"[Discord] {webhook}: delivery error, retrying in {backoff}s: {type(e).__name__}: {e}")
+                wait = None
+
+            if wait is None:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, DISCORD_MAX_BACKOFF)
+            else:
+                backoff = 1
+                time.sleep(wait)
+
+    def _deliver(self, webhook, payload):
+        """
+        Posts the first pending payload of a webhook, returns the seconds to wait before the next post
+        or None to retry this one after a backoff
+        """
+        response = self.post(self.resolve(webhook), payload)
+
+        if response.status_code == 429:
+            wait = retry_after(response)
+            print(f"[Discord] {webhook}: rate limited, retrying in {wait:.2f}s")
+            return wait
+        if response.status_code >= 500:
+            print(f"[Discord] {webhook}: HTTP {response.status_code}, backing off")
+            return None
+        if response.status_code >= 400:
+            # the payload or the webhook is bad, retrying would not help
+            print(f"[Discord] {webhook}: dropping message, HTTP {response.status_code}: {response.text}")
+
+        with self.lock:
+            self.pending[webhook].popleft()
+            self._save_spool()
+        return bucket_wait(response)
+
+    def pending_count(self):
+        with self.lock:
+            return sum(len(payloads) for payloads in self.pending.values())
+
+    def wait(self, timeout=None):
+        """
+        Blocks until every queued payload has been delivered or dropped, returns False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending_count():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+
+_delivery = None
+_delivery_lock = threading.Lock()
+
+def get_discord_delivery():
+    """
+    The process-wide delivery worker, created (and its spool resumed) on first use
+    """
+    global _delivery
+    with _delivery_lock:
+        if _delivery is None:
+            _delivery = DiscordDelivery()
+        return _delivery
@@ -0,0 +1,89 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from stockalerter import utils
+from stockalerter.backend import check_alerts, alerts_for_stock
+from stockalerter.utils import log_to_discord
+
+# Worker processes evaluating alerts, 0 evaluates on the pipeline's threads instead
+EVALUATE_PROCESSES = int(os.getenv("PIPELINE_EVALUATE_PROCESSES", str(os.cpu_count() or 1)))
+
+# Workers are started fresh rather than forked from a process running scheduler, pipeline and delivery threads
+EVALUATE_START_METHOD = os.getenv("PIPELINE_EVALUATE_START_METHOD", "spawn")
+
+
+# WORKER SIDE
+# A worker gets the ticker, its timeframe and its alerts, and loads the prices itself from the price store.
+# The column store memory-maps its files, so the history is shared through the page cache instead of
+# being pickled to the worker. Triggers, log lines and last_triggered times are sent back to the parent.
+
+def evaluate_stock_alerts(stock, alerts, timeframe):
+    """
+    Runs check_alerts in a worker, returns (triggers, logs, last_triggered).
+    \ntriggers holds (alert_id, condition, last bar) per triggered alert, the last bar being all send_alert reads.
+    """
+    triggers = []
+    check_alerts(stock, alerts, timeframe,
+                 notify=lambda stock, alert, condition, df: triggers.append((alert['alert_id'], condition, df.iloc[-1:].copy())))
+
+    logs, utils.LOG_BUFFER[:] = list(utils.LOG_BUFFER), []
+    last_triggered = {alert['alert_id']: alert['last_triggered'] for alert in alerts if alert.get('last_triggered')}
+    return triggers, logs, last_triggered
+
+
+# PARENT SIDE
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_evaluation_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(EVALUATE_PROCESSES, mp_context=multiprocessing.get_context(EVALUATE_START_METHOD))
+        return _pool
+
+def reset_evaluation_pool(broken):
+    """
+    Drops a pool whose worker died (OOM kill, crash in native code), the next get_evaluation_pool starts a new one
+    """
+    global _pool
+    with _pool_lock:
+        # another thread may have replaced it already
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def check_alerts_in_pool(stock, alert_data, timeframe, notify):
+    """
+    check_alerts with the evaluation done by a worker process, notify is called in this process.
+    \nBlocks the calling thread until the worker is done, so N pipeline threads keep N workers busy.
+    """
+    alerts = alerts_for_stock(stock, alert_data, timeframe)
+    if not alerts:
+        return
+
+    pool = get_evaluation_pool()
+    try:
+        triggers, logs, last_triggered = pool.submit(evaluate_stock_alerts, stock, alerts, timeframe).result()
+    except BrokenProcessPool as e:
+        # a dead worker breaks the whole pool, without a new one every later run would fail here
+        print(f"[Evaluation] Worker pool broke while evaluating {stock}, restarting it: {e}")
+        reset_evaluation_pool(pool)
+        triggers, logs, last_triggered = get_evaluation_pool().submit(evaluate_stock_alerts, stock, alerts, timeframe).result()
+
+    for message in logs:
+        log_to_discord(message)
+    by_id = {alert['alert_id']: alert for alert in alerts}
+    for alert_id, when in last_triggered.items():
+        by_id[alert_id]['last_triggered'] = when
+    for alert_id, condition, last_bar in triggers:
+        notify(stock, by_id[alert_id], condition, last_bar)
+
+def get_alert_checker():
+    """
+    check_alerts_in_pool when worker processes are enabled, check_alerts otherwise
+    """
+    return check_alerts_in_pool if EVALUATE_PROCESSES > 0 else check_alerts
@@ -0,0 +1,123 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool, Timeout
+
+# Connections kept alive per host, enough for every fetch and delivery worker to hold one at once
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+
+# Hosts pooled per session (Polygon, Yahoo, Discord)
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "10"))
+
+# Seconds to open a connection and to wait for a response, used when a call passes no timeout
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+
+
+# CONNECTION COUNTERS
+# Every pooled connection pool reports here, reused = requests - opened
+
+class ConnectionStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def _count(self, host, key):
+        with self.lock:
+            counts = self.hosts.setdefault(host, {"opened": 0, "requests": 0})
+            counts[key] += 1
+
+    def opened(self, host):
+        self._count(host, "opened")
+
+    def request(self, host):
+        self._count(host, "requests")
+
+    def snapshot(self):
+        """
+        {host: {"opened", "reused", "requests"}} since the process started
+        """
+        with self.lock:
+            return {host: {"opened": c["opened"], "reused": c["requests"] - c["opened"], "requests": c["requests"]}
+                    for host, c in self.hosts.items()}
+
+CONNECTION_STATS = ConnectionStats()
+
+def connection_stats():
+    return CONNECTION_STATS.snapshot()
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        CONNECTION_STATS.opened(self.host)
+        return super()._new_conn()
+
+    def _get_conn(self, timeout=None):
+        # every request checks a connection out, a new one is opened only when none is idle
+        CONNECTION_STATS.request(self.host)
+        return super()._get_conn(timeout)
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        CONNECTION_STATS.opened(self.host)
+        return super()._new_conn()
+
+    def _get_conn(self, timeout=None):
+        CONNECTION_STATS.request(self.host)
+        return super()._get_conn(timeout)
+
+def pool_manager_with_counters(manager, maxsize=None):
+    """
+    Makes a urllib3 PoolManager keep maxsize connections per host and count them (pools created from now on)
+    """
+    manager.pool_classes_by_scheme = {"http": CountingHTTPConnectionPool, "https": CountingHTTPSConnectionPool}
+    manager.connection_pool_kw["maxsize"] = maxsize or HTTP_POOL_SIZE
+    return manager
+
+
+# SESSIONS
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    Keep-alive adapter with HTTP_POOL_SIZE connections per host, counted pools and a default timeout
+    """
+    def __init__(self, pool_size=None, timeout=None):
+        self.timeout = timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        pool_size = pool_size or HTTP_POOL_SIZE
+        super().__init__(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=pool_size)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        pool_manager_with_counters(self.poolmanager, self._pool_maxsize)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=timeout or self.timeout, **kwargs)
+
+def new_http_session():
+    session = requests.Session()
+    adapter = PooledHTTPAdapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_http_session(name="default"):
+    """
+    Process-wide pooled session, one per name so a library can keep its own cookies and headers (e.g. "yfinance")
+    """
+    with _sessions_lock:
+        if name not in _sessions:
+            _sessions[name] = new_http_session()
+        return _sessions[name]
+
+def pool_polygon_client(client):
+    """
+    Sizes the Polygon RESTClient's urllib3 pools like the sessions (it keeps one connection per host otherwise,
+    so concurrent fetch workers opened and threw away a connection per request) and counts its connections
+    """
+    pool_manager_with_counters(client.client)
+    client.timeout = Timeout(connect=HTTP_CONNECT_TIMEOUT, read=HTTP_READ_TIMEOUT)
+    return client
@@ -2,6 +2,7 @@ import talib
 import numpy as np
 import pandas as pd
 from pykalman import KalmanFilter
+from scipy.signal import lfilter
 
 # CLASSIFICATION ON BASIS OF NUMBER OF INPUTS
 
@@ -76,105 +77,144 @@ def WILLR(df, timeperiod):
 
 
 def HARSI_Flip(df, timeperiod, smoothing):
-    def calculate_harsi_base(df, timeperiod, smoothing):
-        # zero‑centered RSI
-        c = pd.Series(RSI(df, timeperiod, "Close"), index=df.index) - 50
-        h = pd.Series(RSI(df, timeperiod, "High"),   index=df.index) - 50
-        l = pd.Series(RSI(df, timeperiod, "Low"),    index=df.index) - 50
-
-        # previous bar’s zero‑centered close for HA open
-        o = c.shift(1)
-
-        # high/low of RSI for the bar
-        H = np.maximum(h, l)
-        L = np.minimum(h, l)
-
-        # Heikin‑Ashi RSI close
-        close_ha = (o + H + L + c) / 4
-
-        # init HA open series
-        open_ha = pd.Series(index=df.index, dtype=float)
-
-        # find first bar with a valid HA close
-        first = close_ha.first_valid_index()
-        if first is None:
-            return open_ha, pd.Series(np.nan, df.index), pd.Series(np.nan, df.index), close_ha
-
-        # set HA open at first valid bar = midpoint of prior RSI-close and RSI-close
-        open_ha.loc[first] = (o.loc[first] + c.loc[first]) / 2
-
-        # fill subsequent opens recursively
-        idxs = list(df.index)
-        start = idxs.index(first)
-        for i in range(start + 1, len(idxs)):
-            prev = idxs[i - 1]
-            cur  = idxs[i]
-            open_ha.loc[cur] = (open_ha.loc[prev] * smoothing + close_ha.loc[prev]) / (smoothing + 1)
-
-        # HA high/low
-        high_ha = pd.Series(np.maximum.reduce([H, open_ha, close_ha]), index=df.index)
-        low_ha  = pd.Series(np.minimum.reduce([L, open_ha, close_ha]), index=df.index)
-
-        return open_ha, high_ha, low_ha, close_ha
-
-    def har_si_colors(df, timeperiod, smoothing):
-        o, h, l, c = calculate_harsi_base(df, timeperiod, smoothing)
-        return pd.Series(np.where(c > o, "green", "red"), index=df.index)
-
-    def color_transitions(colors):
-        prev = colors.shift(1)
-        result = pd.Series(0, index=colors.index)
-        result[(prev == "green") & (colors == "red")] = 1
-        result[(prev == "red") & (colors == "green")] = 2
-        return result
-    
-    return color_transitions(har_si_colors(df,timeperiod,smoothing))
+    """
+    Heikin-Ashi RSI colour flips.
+    0 = no change
+    1 = green -> red
+    2 = red -> green
+    """
+    open_ha, close_ha, _ = HARSI_CANDLES(df, timeperiod, smoothing)
+
+    # green when the HA close is above the HA open, NaN bars count as red
+    green = close_ha > open_ha
+    prev = np.concatenate(([False], green[:-1]))
+    codes = np.zeros(len(close_ha), dtype=np.int64)
+    codes[1:][prev[1:] & ~green[1:]] = 1
+    codes[1:][~prev[1:] & green[1:]] = 2
+    return pd.Series(codes, index=df.index)
+
+def HARSI_CANDLES(df, timeperiod, smoothing):
+    """
+    Heikin-Ashi candles of the zero-centered RSI.
+    Returns float64 arrays (open_ha, close_ha, rsi_close) where rsi_close is the zero-centered close RSI.
+    """
+    # zero-centered RSI
+    c = np.asarray(RSI(df, timeperiod, "Close"), dtype=float) - 50
+    h = np.asarray(RSI(df, timeperiod, "High"), dtype=float) - 50
+    l = np.asarray(RSI(df, timeperiod, "Low"), dtype=float) - 50
+
+    # previous bar's zero-centered close for HA open
+    o = np.concatenate(([np.nan], c[:-1]))
+
+    # Heikin-Ashi RSI close
+    close_ha = (o + np.maximum(h, l) + np.minimum(h, l) + c) / 4
+
+    # HA open is the first-order linear recurrence
+    #   open_ha[i] = (open_ha[i-1] * smoothing + close_ha[i-1]) / (smoothing + 1)
+    # seeded at the first valid bar with the midpoint of the prior and current RSI close
+    open_ha = np.full(len(c), np.nan)
+    valid = np.flatnonzero(~np.isnan(close_ha))
+    if len(valid):
+        first = valid[0]
+        open_ha[first] = (o[first] + c[first]) / 2
+        a = smoothing / (smoothing + 1)
+        b = 1 / (smoothing + 1)
+        open_ha[first + 1:] = lfilter([b], [1, -a], close_ha[first:-1], zi=[a * open_ha[first]])[0]
+
+    return open_ha, close_ha, c
+
+# RECURSIVE KERNELS
+# Loops that cannot be vectorized run on float64 arrays, compiled with numba when it is installed.
+# Without numba they run on plain Python floats, which is the same IEEE arithmetic, so results are identical
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+def _kalman_velocity_loop(src, kf, gain, vel_gain):
+    kf[0] = src[0]
+    vel = 0.0
+    for i in range(1, len(src)):
+        d = src[i] - kf[i-1]
+        e = kf[i-1] + d * gain
+        vel = vel + d * vel_gain
+        kf[i] = e + vel
+    return vel
+
+_kalman_velocity_jit = njit(cache=True)(_kalman_velocity_loop) if njit is not None else None
+
+def kalman_velocity_filter(src, sharp, k_period, return_velocity=False):
+    """
+    Kalman filter with a velocity term used by SROCST, src is any float sequence.
+    Returns a float64 array of the filtered values, and the final velocity when return_velocity is set.
+    """
+    src = np.ascontiguousarray(src, dtype=np.float64)
+    if len(src) == 0:
+        return (src.copy(), 0.0) if return_velocity else src.copy()
+
+    gain = float(np.sqrt(sharp * k_period / 100))
+    vel_gain = k_period / 100
+
+    if _kalman_velocity_jit is not None:
+        kf = np.empty_like(src)
+        vel = _kalman_velocity_jit(src, kf, gain, vel_gain)
+    else:
+        kf = [0.0] * len(src)
+        vel = _kalman_velocity_loop(src.tolist(), kf, gain, vel_gain)
+        kf = np.array(kf)
+
+    return (kf, float(vel)) if return_velocity else kf
+
+def _shift(values, periods):
+    # numpy equivalent of Series.shift for periods >= 0
+    if periods == 0:
+        return values
+    shifted = np.full(len(values), np.nan)
+    shifted[periods:] = values[:-periods]
+    return shifted
 
 def SROCST(df, ma_type='EMA', lsma_off=0, smooth_len=12, kal_src='Close', sharp=25.0, k_period=1.0, roc_len=9, stoch_len=14, stoch_k_smooth=1, stoch_d_smooth=3):
-    def f_ma(ma_type, df, period, src, lsma_off=0):
-        ma_type = ma_type.lower()
-        if ma_type=='sma': return SMA(df, period, src)
-        if ma_type=='ema': return EMA(df, period, src)
-        if ma_type=='hma': return HMA(df, period, src)
-        raise ValueError(type)
-
-    def calc_srocst_line(df, ma_type='EMA', lsma_off=0, smooth_len=12, kal_src='Close', sharp=25.0, k_period=1.0, roc_len=9, stoch_len=14, stoch_k_smooth=1, stoch_d_smooth=3):
-        kf=pd.Series(index=df.index,dtype=float)
-        vel=pd.Series(0.0,index=df.index)
-        for i in range(len(df)):
-            if i==0:
-                kf.iat[0]=df[kal_src].iat[0]
-            else:
-                d=df[kal_src].iat[i]-kf.iat[i-1]
-                e=kf.iat[i-1]+d*np.sqrt(sharp*k_period/100)
-                vel.iat[i]=vel.iat[i-1]+d*(k_period/100)
-                kf.iat[i]=e+vel.iat[i]
-        roc=100*(kf-kf.shift(roc_len))/kf.shift(roc_len)
-        low=df['Low'].rolling(stoch_len).min()
-        high=df['High'].rolling(stoch_len).max()
-        k_raw=(df['Close']-low)/(high-low)*100
-        k_sma=k_raw.rolling(stoch_k_smooth).mean()
-        d_sma=k_sma.rolling(stoch_d_smooth).mean()
-        blend=f_ma(ma_type,df,smooth_len,(roc+d_sma)/2,lsma_off)
-        return blend
-
-    def calc_srocst_colors(blend):
-        return pd.Series(np.where(blend>blend.shift(1),'white','blue'),index=blend.index)
-
-    def color_transition_codes(colors: pd.Series) -> pd.Series:
-        """
-        Given a Series of 'white'/'blue' values, returns:
-        0 = no change
-        1 = white -> blue
-        2 = blue -> white
-        """
-        prev = colors.shift(1)
-        codes = pd.Series(0, index=colors.index)
-        codes[(prev == 'white') & (colors == 'blue')] = 1
-        codes[(prev == 'blue') & (colors == 'white')] = 2
-        return codes
-    
-    return color_transition_codes(calc_srocst_colors(calc_srocst_line(df, ma_type, lsma_off, smooth_len, kal_src, sharp, k_period, roc_len, stoch_len, stoch_k_smooth, stoch_d_smooth)))
+    """
+    Smoothed ROC + stochastic colour transitions.
+    0 = no change
+    1 = white -> blue
+    2 = blue -> white
+    """
+    blend = SROCST_LINE(df, ma_type, lsma_off, smooth_len, kal_src, sharp, k_period, roc_len, stoch_len, stoch_k_smooth, stoch_d_smooth)
+
+    # white while the line rises, NaN bars count as blue
+    white = blend > _shift(blend, 1)
+    prev = np.concatenate(([False], white[:-1]))
+    codes = np.zeros(len(blend), dtype=np.int64)
+    codes[1:][prev[1:] & ~white[1:]] = 1
+    codes[1:][~prev[1:] & white[1:]] = 2
+    return pd.Series(codes, index=df.index)
+
+def SROCST_LINE(df, ma_type='EMA', lsma_off=0, smooth_len=12, kal_src='Close', sharp=25.0, k_period=1.0, roc_len=9, stoch_len=14, stoch_k_smooth=1, stoch_d_smooth=3):
+    """
+    The SROCST line as a float64 array: the moving average of the mean of the Kalman-filtered ROC and the stochastic %D
+    """
+    kf = kalman_velocity_filter(df[kal_src], sharp, k_period)
+    kf_prev = _shift(kf, roc_len)
+    roc = 100 * (kf - kf_prev) / kf_prev
+
+    # rolling windows stay on pandas so the rolling means match bar for bar
+    low = df['Low'].rolling(stoch_len).min().to_numpy()
+    high = df['High'].rolling(stoch_len).max().to_numpy()
+    k_raw = pd.Series((df['Close'].to_numpy() - low) / (high - low) * 100)
+    k_sma = k_raw.rolling(stoch_k_smooth).mean()
+    d_sma = k_sma.rolling(stoch_d_smooth).mean().to_numpy()
+
+    src = (roc + d_sma) / 2
+    ma_type = ma_type.lower()
+    if ma_type == 'sma':
+        return np.asarray(SMA(df, smooth_len, src), dtype=float)
+    if ma_type == 'ema':
+        return np.asarray(EMA(df, smooth_len, src), dtype=float)
+    if ma_type == 'hma':
+        return np.asarray(HMA(df, smooth_len, src), dtype=float)
+    raise ValueError(f"Unknown SROCST ma_type {ma_type!r}")
 
 # MULTI INPUTTED SINGLE OUTPUT
 
@@ -209,15 +249,20 @@ def KALMAN(df, period, input):
     Returns a pd.Series of the filtered states.
     """
     price = df[input] if isinstance(input, str) else input
-    kf = KalmanFilter(
+    state_means, _ = kalman_filter(period, price.iloc[0]).filter(price.values)
+    return pd.Series(state_means.flatten(), index=df.index)
+
+def kalman_filter(period, initial_state_mean):
+    """
+    The pykalman filter behind KALMAN, also used to advance it one observation at a time
+    """
+    return KalmanFilter(
         transition_matrices=[1],
         observation_matrices=[1],
-        initial_state_mean=price.iloc[0],
+        initial_state_mean=initial_state_mean,
         transition_covariance=0.01,
         observation_covariance=1.0 / period
     )
-    state_means, _ = kf.filter(price.values)
-    return pd.Series(state_means.flatten(), index=df.index)
 
 def KALMAN_COLOURS(df, period, input):
     """
@@ -242,6 +287,66 @@ def KALMAN_COLOUR_TRANSITIONS(df, period, input):
     codes[(prev == "red")   & (colours == "green")] = 2
     return codes
 
+def _super_trend_loop(close, basic_upper, basic_lower, final_upper, final_lower, trend):
+    final_upper[0] = basic_upper[0]
+    final_lower[0] = basic_lower[0]
+    trend[0] = 1.0
+    for i in range(1, len(close)):
+        # written like min()/max() so NaN bands during the ATR warm-up resolve the same way
+        if close[i-1] <= final_upper[i-1]:
+            final_upper[i] = final_upper[i-1] if final_upper[i-1] < basic_upper[i] else basic_upper[i]
+        else:
+            final_upper[i] = basic_upper[i]
+        if close[i-1] >= final_lower[i-1]:
+            final_lower[i] = final_lower[i-1] if final_lower[i-1] > basic_lower[i] else basic_lower[i]
+        else:
+            final_lower[i] = basic_lower[i]
+
+        if close[i] > final_upper[i-1]:
+            trend[i] = 1.0
+        elif close[i] < final_lower[i-1]:
+            trend[i] = -1.0
+        else:
+            trend[i] = trend[i-1]
+
+_super_trend_jit = njit(cache=True)(_super_trend_loop) if njit is not None else None
+
+def SUPER_TREND_COMPONENTS(df, atr_period, multiplier):
+    """
+    Supertrend bands, trend, colours and colour transitions from a single pass over the bars.
+    Returns a dict of Series with the keys "upper", "lower", "trend", "colours" and "transitions".
+    """
+    atr = np.asarray(ATR(df, atr_period), dtype=np.float64)
+    hl2 = (df["High"].to_numpy(dtype=np.float64) + df["Low"].to_numpy(dtype=np.float64)) / 2
+    close = np.ascontiguousarray(df["Close"].to_numpy(dtype=np.float64))
+
+    basic_upper = hl2 + multiplier * atr
+    basic_lower = hl2 - multiplier * atr
+
+    if len(close) == 0:
+        final_upper, final_lower, trend = basic_upper, basic_lower, np.empty(0)
+    elif _super_trend_jit is not None:
+        final_upper, final_lower, trend = np.empty_like(close), np.empty_like(close), np.empty_like(close)
+        _super_trend_jit(close, basic_upper, basic_lower, final_upper, final_lower, trend)
+    else:
+        final_upper, final_lower, trend = [0.0] * len(close), [0.0] * len(close), [0.0] * len(close)
+        _super_trend_loop(close.tolist(), basic_upper.tolist(), basic_lower.tolist(), final_upper, final_lower, trend)
+        final_upper, final_lower, trend = np.array(final_upper), np.array(final_lower), np.array(trend)
+
+    green = trend == 1
+    prev = np.concatenate(([False], green[:-1]))
+    codes = np.zeros(len(trend), dtype=np.int64)
+    codes[1:][prev[1:] & ~green[1:]] = 1
+    codes[1:][~prev[1:] & green[1:]] = 2
+
+    return {
+        "upper": pd.Series(final_upper, index=df.index),
+        "lower": pd.Series(final_lower, index=df.index),
+        "trend": pd.Series(trend, index=df.index),
+        "colours": pd.Series(np.where(green, "green", "red").astype(object), index=df.index),
+        "transitions": pd.Series(codes, index=df.index),
+    }
+
 def SUPER_TREND(df, atr_period, multiplier):
     """
     Classic Supertrend:
@@ -249,45 +354,14 @@ def SUPER_TREND(df, atr_period, multiplier):
       -> multiplier - factor on ATR for band width
     Returns +1 for uptrend, -1 for downtrend.
     """
-    atr = ATR(df, atr_period)
-    hl2 = (df["High"] + df["Low"]) / 2
-
-    basic_upper = hl2 + multiplier * atr
-    basic_lower = hl2 - multiplier * atr
-
-    final_upper = basic_upper.copy()
-    final_lower = basic_lower.copy()
-    for i in range(1, len(df)):
-        if df["Close"].iat[i-1] <= final_upper.iat[i-1]:
-            final_upper.iat[i] = min(basic_upper.iat[i], final_upper.iat[i-1])
-        else:
-            final_upper.iat[i] = basic_upper.iat[i]
-        if df["Close"].iat[i-1] >= final_lower.iat[i-1]:
-            final_lower.iat[i] = max(basic_lower.iat[i], final_lower.iat[i-1])
-        else:
-            final_lower.iat[i] = basic_lower.iat[i]
-
-    trend = pd.Series(index=df.index, dtype=int)
-    trend.iat[0] = 1
-    for i in range(1, len(df)):
-        if df["Close"].iat[i] > final_upper.iat[i-1]:
-            trend.iat[i] = 1
-        elif df["Close"].iat[i] < final_lower.iat[i-1]:
-            trend.iat[i] = -1
-        else:
-            trend.iat[i] = trend.iat[i-1]
-    return trend
+    return SUPER_TREND_COMPONENTS(df, atr_period, multiplier)["trend"]
 
 
 def SUPER_TREND_COLOURS(df, atr_period, multiplier):
     """
     "green" for uptrend (+1), "red" for downtrend (-1).
     """
-    tr = SUPER_TREND(df, atr_period, multiplier)
-    return pd.Series(
-        np.where(tr.eq(1), "green", "red"),
-        index=df.index
-    )
+    return SUPER_TREND_COMPONENTS(df, atr_period, multiplier)["colours"]
 
 
 def SUPER_TREND_COLOUR_TRANSITIONS(df, atr_period, multiplier):
@@ -296,9 +370,4 @@ def SUPER_TREND_COLOUR_TRANSITIONS(df, atr_period, multiplier):
     1 = green → red (up → down)
     2 = red   → green (down → up)
     """
-    colours = SUPER_TREND_COLOURS(df, atr_period, multiplier)
-    prev = colours.shift(1)
-    codes = pd.Series(0, index=df.index, dtype=int)
-    codes[(prev == "green") & (colours == "red")]   = 1
-    codes[(prev == "red")   & (colours == "green")] = 2
-    return codes
+    return SUPER_TREND_COMPONENTS(df, atr_period, multiplier)["transitions"]
@@ -24,6 +24,7 @@ from stockalerter.utils import (
     grab_new_data_yfinance,
     save_alert
 )
+from stockalerter.price_store import get_price_store, to_price_frame
 
 # Load market data
 market_data = load_market_data()
@@ -176,23 +177,10 @@ if st.button("Add Alert"):
                         failures.append(f"{stock_name}: {e}")
                         continue
 
-                # flatten MultiIndex columns if present
-                if hasattr(df_stock.columns, "nlevels") and df_stock.columns.nlevels > 1:
-                    df_stock.columns = [
-                        "_".join([str(x) for x in col if x]).strip()
-                        for col in df_stock.columns.values
-                    ]
-
-                # prepare and save CSV (overwrite with fresh data)
-                if "Date" not in df_stock.columns:
-                    df_stock.reset_index(inplace=True)
-                df_stock.insert(0, "index", range(1, len(df_stock) + 1))
-                df_final = df_stock.copy()
-
+                # save the fresh history to the price store (overwrite)
                 safe_ticker = ticker.replace(" ", "_")
                 tf_name = timeframe.replace("1", "").replace("d", "daily").replace("wk", "weekly")
-                file_path = os.path.join("data", f"{safe_ticker}_{tf_name}.csv")
-                df_final.to_csv(file_path, index=False, date_format="%Y-%m-%d")
+                get_price_store().save(safe_ticker, tf_name, to_price_frame(df_stock))
 
                 # build conditions payload
                 entry_conditions_list = [
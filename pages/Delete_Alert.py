@@ -1,15 +1,12 @@
 import streamlit as st
-import json
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from stockalerter.alert_store import get_alert_store
 
-# Load alert data from JSON file
+# Load alert data from the alert store (alerts.json or alerts.db)
 def load_alert_data():
-    with open("alerts.json", "r") as file:
-        return json.load(file)
-
-# Save updated alert data to JSON file
-def save_alert_data(alert_data):
-    with open("alerts.json", "w") as file:
-        json.dump(alert_data, file, indent=4)
+    return get_alert_store().load()
 
 # Load alerts
 alert_data = load_alert_data()
@@ -50,7 +47,6 @@ else:
 
     # Delete all selected alerts
     if st.button("Delete Alert(s)"):
-        alert_data = [alert for alert in alert_data if alert['alert_id'] not in selected_alert_ids]
-        save_alert_data(alert_data)
+        get_alert_store().delete(selected_alert_ids)
         st.success("Selected alert(s) deleted successfully!")
         st.rerun()
@@ -0,0 +1,148 @@
+import os
+import queue
+import threading
+from stockalerter.evaluation_pool import get_alert_checker
+from stockalerter.utils import get_latest_stock_data_batch, fetch_batch_size, update_stock_database, send_alert, flush_alerts_to_discord, log_to_discord
+
+# Per-stage concurrency of a market run, overridable through the environment
+# fetch threads of US runs, the yfinance exchanges are fetched on one
+FETCH_WORKERS = int(os.getenv("PIPELINE_FETCH_WORKERS", "8"))
+STORE_WORKERS = int(os.getenv("PIPELINE_STORE_WORKERS", "2"))
+# with worker processes enabled (PIPELINE_EVALUATE_PROCESSES) each evaluate thread keeps one process busy
+EVALUATE_WORKERS = int(os.getenv("PIPELINE_EVALUATE_WORKERS", str(os.cpu_count() or 1)))
+NOTIFY_WORKERS = int(os.getenv("PIPELINE_NOTIFY_WORKERS", "2"))
+
+# Capacity of the queues between stages, a fast stage blocks instead of piling up frames in memory
+QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "32"))
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+class Stage:
+    """
+    A pool of worker threads applying func to every item of inbox.
+    \nItems are tickers, lists of tickers or tuples starting with the ticker. func returns the item
+    handed to the next stage (None drops it), a fan_out stage returns a list of items instead.
+    An exception fails only that item: its tickers are recorded in failures and the stage moves on.
+    Once every worker has seen _DONE the stage closes its outbox, so shutdown flows down the pipeline.
+    """
+    def __init__(self, name, func, inbox, outbox, workers, failures, fan_out=False):
+        self.name = name
+        self.func = func
+        self.fan_out = fan_out
+        self.inbox = inbox
+        self.outbox = outbox
+        self.failures = failures
+        self.remaining = workers
+        self.lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+    def _work(self):
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                # hand the marker to the sibling workers, the last one to stop closes the outbox
+                self.inbox.put(_DONE)
+                with self.lock:
+                    self.remaining -= 1
+                    last = self.remaining == 0
+                if last and self.outbox is not None:
+                    self.outbox.put(_DONE)
+                return
+
+            try:
+                result = self.func(item)
+            except Exception as e:
+                stocks = item if isinstance(item, list) else [item[0] if isinstance(item, tuple) else item]
+                print(f"[Pipeline] {self.name} failed for {', '.join(stocks)}: {e}")
+                log_to_discord(f"❌ {self.name} failed for {', '.join(stocks)}: {e}")
+                self.failures.extend(stocks)
+                continue
+
+            if result is None or self.outbox is None:
+                continue
+            for out in (result if self.fan_out else [result]):
+                self.outbox.put(out)
+
+
+def run_market_pipeline(market_code, stocks, alert_data, timespan, timeframe,
+                        fetch_workers=None, store_workers=None, evaluate_workers=None, notify_workers=None, queue_size=None):
+    """
+    Runs fetch -> store -> evaluate -> notify for every stock of a market with all stages working
+    concurrently, so the run takes roughly as long as its slowest stage instead of the sum of all of them.
+    \ntimespan is the provider timespan ("day"/"week"), timeframe the store timeframe ("daily"/"weekly").
+    \nReturns (successes, failures) as lists of tickers.
+    """
+    queue_size = queue_size or QUEUE_SIZE
+    fetched = queue.Queue(queue_size)
+    stored = queue.Queue(queue_size)
+    triggered = queue.Queue(queue_size)
+    batches = queue.Queue(queue_size)
+
+    successes, failures = [], []
+    # embeds of this run's triggered alerts, other markets running at the same time keep their own
+    embeds = []
+
+    def fetch(batch):
+        log_to_discord(f"🔄 Updating {', '.join(batch)}... with new data")
+        frames = get_latest_stock_data_batch(batch, market_code, timespan=timespan)
+        for stock in batch:
+            if stock not in frames:
+                log_to_discord(f"❌ No new data for {stock}.")
+                failures.append(stock)
+        return [(stock, frames[stock]) for stock in batch if stock in frames]
+
+    def store(item):
+        stock, new_stock_data = item
+        update_stock_database(stock, new_stock_data, timeframe=timeframe)
+        successes.append(stock)
+        return stock
+
+    check = get_alert_checker()
+
+    def evaluate(stock):
+        alerts = []
+        check(stock, alert_data, timeframe, notify=lambda *args: alerts.append(args))
+        return (stock, alerts) if alerts else None
+
+    def notify(item):
+        stock, alerts = item
+        for args in alerts:
+            send_alert(*args, embeds=embeds)
+
+    # other exchanges are fetched with yf.download, which keeps its results in module globals and cannot
+    # overlap with another call, one fetch thread suffices since yfinance downloads a chunk on its own threads
+    if fetch_workers is None:
+        fetch_workers = FETCH_WORKERS if market_code == "US" else 1
+
+    stages = [
+        Stage("fetch", fetch, batches, fetched, fetch_workers, failures, fan_out=True),
+        Stage("store", store, fetched, stored, store_workers or STORE_WORKERS, failures),
+        Stage("evaluate", evaluate, stored, triggered, evaluate_workers or EVALUATE_WORKERS, failures),
+        Stage("notify", notify, triggered, None, notify_workers or NOTIFY_WORKERS, failures),
+    ]
+    for stage in stages:
+        stage.start()
+
+    # providers that serve many tickers per request get them in batches
+    stocks = list(stocks)
+    batch_size = fetch_batch_size(market_code, timespan)
+    for i in range(0, len(stocks), batch_size):
+        batches.put(stocks[i:i + batch_size])
+    batches.put(_DONE)
+
+    for stage in stages:
+        stage.join()
+
+    # the run's triggered alerts go out together, batched into multi-embed messages
+    flush_alerts_to_discord(embeds)
+    return successes, failures
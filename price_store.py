@@ -0,0 +1,290 @@
+import argparse
+import glob
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Directory holding the price history of every tracked ticker
+DATA_DIR = "data"
+
+# Backend returned by get_price_store(), "columns" (binary column files) or "csv" (legacy files)
+PRICE_STORE_BACKEND = os.getenv("PRICE_STORE_BACKEND", "columns")
+
+# Provider dates are wall-clock times of this timezone
+MARKET_TIMEZONE = "America/New_York"
+
+TIMESTAMP_COLUMN = "Date"
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume", "VWAP", "Trades"]
+
+TIMESTAMP_DTYPE = "<i8"
+PRICE_DTYPE = "<f8"
+
+
+# DATE CONVERSIONS
+# The store keeps dates as int64 nanoseconds since epoch (UTC)
+
+def dates_to_timestamps(dates):
+    """
+    Converts provider dates ("14-03-2025 00:00:00 EDT"), ISO dates or datetimes into int64 timestamps
+    """
+    dates = pd.Series(np.asarray(dates))
+    if pd.api.types.is_integer_dtype(dates):
+        return dates.to_numpy(dtype="int64")
+
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        # the timezone label is informational only, provider dates are New York wall-clock times
+        text = dates.astype(str).str.replace(r"\s+[A-Za-z]{2,5}$", "", regex=True)
+        try:
+            dates = pd.to_datetime(text, format="%d-%m-%Y %H:%M:%S")
+        except (ValueError, TypeError):
+            dates = pd.to_datetime(text, format="mixed", dayfirst=True)
+
+    if dates.dt.tz is None:
+        dates = dates.dt.tz_localize(MARKET_TIMEZONE)
+    return dates.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy(dtype="datetime64[ns]").view("int64")
+
+def timestamps_to_dates(timestamps):
+    """
+    Inverse of dates_to_timestamps, formats timestamps the way the providers label their bars
+    """
+    dates = pd.to_datetime(np.asarray(timestamps, dtype="int64"), unit="ns", utc=True).tz_convert(MARKET_TIMEZONE)
+    return dates.strftime("%d-%m-%Y %H:%M:%S %Z")
+
+def to_price_frame(df):
+    """
+    Converts a provider frame (Date index or column) into the store layout:
+    an int64 Date column followed by float64 price columns, sorted by Date without duplicates
+    """
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+
+    dates = df[TIMESTAMP_COLUMN] if TIMESTAMP_COLUMN in df.columns else df.index
+    frame = {TIMESTAMP_COLUMN: dates_to_timestamps(dates)}
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            frame[col] = pd.to_numeric(np.asarray(df[col]).ravel(), errors="coerce").astype("float64")
+
+    frame = pd.DataFrame(frame)
+    frame = frame.sort_values(TIMESTAMP_COLUMN, kind="stable").drop_duplicates(TIMESTAMP_COLUMN, keep="last")
+    return frame.reset_index(drop=True)
+
+def bars_since(df, last_timestamp):
+    """
+    Splits a sorted price frame at the last stored timestamp.
+    \nReturns (bars, replaces_last): the bars at or after last_timestamp, and whether the first of them
+    is the stored last bar again (it may have been partial, so it overwrites the stored one)
+    """
+    if last_timestamp is None:
+        return df, False
+
+    timestamps = df[TIMESTAMP_COLUMN].to_numpy()
+    start = int(np.searchsorted(timestamps, last_timestamp, side="left"))
+    bars = df.iloc[start:]
+    replaces_last = len(bars) > 0 and timestamps[start] == last_timestamp
+    return bars, replaces_last
+
+
+# STORE BACKENDS
+# Every backend exposes exists / load / save / append / last_timestamp on frames in the to_price_frame layout
+
+class ColumnPriceStore:
+    """
+    One directory per ticker and timeframe with a raw little-endian file per column
+    and a meta.json holding the row count and column dtypes.
+    \nload() memory-maps the column files, so reading a ticker neither parses nor copies the history.
+    """
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+
+    def path(self, stock, timeframe):
+        return os.path.join(self.data_dir, f"{stock}_{timeframe}")
+
+    def _meta_path(self, stock, timeframe):
+        return os.path.join(self.path(stock, timeframe), "meta.json")
+
+    def _column_path(self, stock, timeframe, col):
+        return os.path.join(self.path(stock, timeframe), f"{col}.bin")
+
+    def exists(self, stock, timeframe):
+        return os.path.exists(self._meta_path(stock, timeframe))
+
+    def read_meta(self, stock, timeframe):
+        with open(self._meta_path(stock, timeframe), "r") as file:
+            return json.load(file)
+
+    def _write_meta(self, stock, timeframe, meta):
+        # written last and swapped in atomically, readers never see a row count the column files do not hold
+        meta_path = self._meta_path(stock, timeframe)
+        with open(meta_path + ".tmp", "w") as file:
+            json.dump(meta, file)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def load(self, stock, timeframe):
+        if not self.exists(stock, timeframe):
+            return None
+
+        meta = self.read_meta(stock, timeframe)
+        rows = meta["rows"]
+        columns = {}
+        for col, dtype in meta["columns"].items():
+            if rows == 0:
+                columns[col] = np.empty(0, dtype=dtype)
+            else:
+                columns[col] = np.memmap(self._column_path(stock, timeframe, col), dtype=dtype, mode="r", shape=(rows,))
+        return pd.DataFrame(columns, copy=False)
+
+    def save(self, stock, timeframe, df):
+        os.makedirs(self.path(stock, timeframe), exist_ok=True)
+        meta = {"rows": len(df), "columns": {}}
+        for col in df.columns:
+            dtype = TIMESTAMP_DTYPE if col == TIMESTAMP_COLUMN else PRICE_DTYPE
+            col_path = self._column_path(stock, timeframe, col)
+            # replaced rather than rewritten in place, so frames still mapping the old file stay valid
+            np.ascontiguousarray(df[col].to_numpy(), dtype=dtype).tofile(col_path + ".tmp")
+            os.replace(col_path + ".tmp", col_path)
+            meta["columns"][col] = dtype
+        self._write_meta(stock, timeframe, meta)
+
+    def last_timestamp(self, stock, timeframe):
+        if not self.exists(stock, timeframe):
+            return None
+
+        rows = self.read_meta(stock, timeframe)["rows"]
+        if rows == 0:
+            return None
+
+        itemsize = np.dtype(TIMESTAMP_DTYPE).itemsize
+        with open(self._column_path(stock, timeframe, TIMESTAMP_COLUMN), "rb") as file:
+            file.seek((rows - 1) * itemsize)
+            return int(np.frombuffer(file.read(itemsize), dtype=TIMESTAMP_DTYPE)[0])
+
+    def append(self, stock, timeframe, df):
+        """
+        Writes only the bars of df newer than the stored history, overwriting the stored last bar
+        when df carries it again. The cost is proportional to the new bars, not to the history.
+        \nReturns the number of bars written.
+        """
+        if not self.exists(stock, timeframe):
+            self.save(stock, timeframe, df)
+            return len(df)
+
+        meta = self.read_meta(stock, timeframe)
+        rows = meta["rows"]
+        bars, replaces_last = bars_since(df, self.last_timestamp(stock, timeframe))
+        if bars.empty:
+            return 0
+
+        start = rows - 1 if replaces_last else rows
+        for col, dtype in meta["columns"].items():
+            if col in bars.columns:
+                values = np.ascontiguousarray(bars[col].to_numpy(), dtype=dtype)
+            else:
+                values = np.full(len(bars), np.nan, dtype=dtype)
+
+            # bytes past meta["rows"] are not visible to readers until the meta file is swapped
+            with open(self._column_path(stock, timeframe, col), "r+b") as file:
+                file.seek(start * np.dtype(dtype).itemsize)
+                file.write(values.tobytes())
+
+        meta["rows"] = start + len(bars)
+        self._write_meta(stock, timeframe, meta)
+        return len(bars)
+
+
+class CsvPriceStore:
+    """
+    Legacy data/{ticker}_{timeframe}.csv files, kept for migration and as a fallback backend
+    """
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+
+    def path(self, stock, timeframe):
+        return os.path.join(self.data_dir, f"{stock}_{timeframe}.csv")
+
+    def exists(self, stock, timeframe):
+        return os.path.exists(self.path(stock, timeframe))
+
+    def load(self, stock, timeframe):
+        if not self.exists(stock, timeframe):
+            return None
+        return to_price_frame(pd.read_csv(self.path(stock, timeframe)))
+
+    def save(self, stock, timeframe, df):
+        os.makedirs(self.data_dir, exist_ok=True)
+        out = df.copy()
+        out[TIMESTAMP_COLUMN] = timestamps_to_dates(out[TIMESTAMP_COLUMN])
+        out.insert(0, "index", range(1, len(out) + 1))
+        out.to_csv(self.path(stock, timeframe), index=False)
+
+    def last_timestamp(self, stock, timeframe):
+        df = self.load(stock, timeframe)
+        if df is None or df.empty:
+            return None
+        return int(df[TIMESTAMP_COLUMN].iloc[-1])
+
+    def append(self, stock, timeframe, df):
+        # text files cannot be extended column-wise, this backend still rewrites the whole file
+        existing = self.load(stock, timeframe)
+        if existing is None:
+            self.save(stock, timeframe, df)
+            return len(df)
+
+        last = int(existing[TIMESTAMP_COLUMN].iloc[-1]) if len(existing) else None
+        bars, replaces_last = bars_since(df, last)
+        if bars.empty:
+            return 0
+
+        if replaces_last:
+            existing = existing.iloc[:-1]
+        self.save(stock, timeframe, pd.concat([existing, bars], ignore_index=True))
+        return len(bars)
+
+
+PRICE_STORES = {
+    "columns": ColumnPriceStore,
+    "csv": CsvPriceStore,
+}
+
+def get_price_store(backend=None, data_dir=DATA_DIR):
+    backend = backend or PRICE_STORE_BACKEND
+    if backend not in PRICE_STORES:
+        raise ValueError(f"Unknown price store backend {backend!r}, expected one of {list(PRICE_STORES)}")
+    return PRICE_STORES[backend](data_dir)
+
+
+# ONE-SHOT MIGRATION FROM THE CSV FILES
+
+def migrate_csv_prices(data_dir=DATA_DIR, backend="columns", remove_csv=False):
+    """
+    Copies every data/{ticker}_{timeframe}.csv into the given backend, returns the migrated (ticker, timeframe) pairs
+    """
+    source = CsvPriceStore(data_dir)
+    target = get_price_store(backend, data_dir)
+    migrated = []
+
+    for csv_path in sorted(glob.glob(os.path.join(data_dir, "*.csv"))):
+        stock, _, timeframe = os.path.basename(csv_path)[:-len(".csv")].rpartition("_")
+        if not stock:
+            print(f"Skipping {csv_path}, expected a {{ticker}}_{{timeframe}}.csv name")
+            continue
+
+        df = source.load(stock, timeframe)
+        target.save(stock, timeframe, df)
+        migrated.append((stock, timeframe))
+        print(f"Migrated {stock} ({timeframe}), {len(df)} bars")
+
+        if remove_csv:
+            os.remove(csv_path)
+
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the CSV price history into the binary price store")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--backend", default="columns", choices=list(PRICE_STORES))
+    parser.add_argument("--remove-csv", action="store_true", help="delete each CSV once it is migrated")
+    args = parser.parse_args()
+    migrate_csv_prices(args.data_dir, args.backend, args.remove_csv)
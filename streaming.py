@@ -0,0 +1,363 @@
+import copy
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
+from stockalerter.price_store import DATA_DIR, TIMESTAMP_COLUMN
+
+# Persisted streaming state, check_alerts falls back to full computation when this is off
+INDICATOR_STATE_ENABLED = os.getenv("INDICATOR_STATE", "1") == "1"
+
+# Number of trailing outputs kept per indicator, specifiers from [-1] to [-INDICATOR_STATE_TAIL] are served from state
+INDICATOR_STATE_TAIL = int(os.getenv("INDICATOR_STATE_TAIL", "5"))
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close"]
+
+NAN = float("nan")
+
+
+# STEP FUNCTIONS
+# Each takes the indicator's state dict (empty before the first bar), the next bar and the indicator dict,
+# updates the state in place and returns the indicator value at that bar.
+# They follow the same recursions and warm-up as indicators_lib / ta-lib, so a streamed value agrees with
+# the full computation up to floating point rounding; codes (HARSI_Flip, SROCST, transitions) agree exactly
+# unless two values tie to the last bit.
+
+def _ema(state, x, period):
+    # ta-lib EMA, seeded with the SMA of the first period values, leading NaNs are skipped
+    count = state.get("count", 0)
+    if count == 0 and math.isnan(x):
+        return NAN
+
+    count += 1
+    state["count"] = count
+    if count < period:
+        state["sum"] = state.get("sum", 0.0) + x
+        return NAN
+    if count == period:
+        state["ema"] = (state.get("sum", 0.0) + x) / period
+    else:
+        state["ema"] = (x - state["ema"]) * (2.0 / (period + 1)) + state["ema"]
+    return state["ema"]
+
+def _wilder(state, value, period, name):
+    # Wilder smoothing with an SMA seed, shared by RSI and ATR
+    count = state.get(name + "_count", 0) + 1
+    state[name + "_count"] = count
+    if count < period:
+        state[name] = state.get(name, 0.0) + value
+        return NAN
+    if count == period:
+        state[name] = (state.get(name, 0.0) + value) / period
+    else:
+        state[name] = (state[name] * (period - 1) + value) / period
+    return state[name]
+
+def _rsi(state, x, period):
+    if "prev" not in state:
+        state["prev"] = x
+        return NAN
+
+    diff = x - state["prev"]
+    state["prev"] = x
+    gain = _wilder(state, diff if diff > 0 else 0.0, period, "gain")
+    loss = _wilder(state, -diff if diff < 0 else 0.0, period, "loss")
+    if math.isnan(gain):
+        return NAN
+
+    total = gain + loss
+    return 0.0 if -0.00000001 < total < 0.00000001 else 100 * (gain / total)
+
+def _window(state, name, value, length):
+    # the last length values of a series, None until the window is full or while it holds a NaN
+    window = state.setdefault(name, [])
+    window.append(value)
+    if len(window) > length:
+        del window[0]
+    if len(window) < length or any(math.isnan(v) for v in window):
+        return None
+    return window
+
+def _divide(a, b):
+    # float division with numpy semantics, a zero range gives inf/NaN like the vectorized version instead of raising
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return float(np.float64(a) / b)
+
+def _transition(state, green):
+    # 0 = no change, 1 = green -> red, 2 = red -> green
+    prev = state.get("green", False)
+    state["green"] = green
+    if prev and not green:
+        return 1
+    if not prev and green:
+        return 2
+    return 0
+
+def step_ema(state, bar, ind):
+    return _ema(state, bar[ind['input']], int(ind['period']))
+
+def step_rsi(state, bar, ind):
+    return _rsi(state, bar[ind['input']], int(ind['period']))
+
+def step_atr(state, bar, ind):
+    if "close" not in state:
+        state["close"] = bar["Close"]
+        return NAN
+
+    # true range, same comparison order as ta-lib's TRANGE
+    prev_close = state["close"]
+    state["close"] = bar["Close"]
+    true_range = bar["High"] - bar["Low"]
+    if abs(prev_close - bar["High"]) > true_range:
+        true_range = abs(prev_close - bar["High"])
+    if abs(prev_close - bar["Low"]) > true_range:
+        true_range = abs(prev_close - bar["Low"])
+    return _wilder(state, true_range, int(ind['period']), "atr")
+
+def step_macd(state, bar, ind):
+    fast_period, slow_period = int(ind['fast_period']), int(ind['slow_period'])
+    if slow_period < fast_period:
+        fast_period, slow_period = slow_period, fast_period
+
+    # ta-lib seeds the fast EMA on the bar the slow one starts, with the SMA of the fast_period values before it
+    x = bar['Close']
+    if "slow" not in state:
+        window = _window(state, "warm", x, slow_period)
+        if window is None:
+            return NAN
+        state["slow"] = {"count": slow_period, "ema": sum(window) / slow_period}
+        state["fast"] = {"count": fast_period, "ema": sum(window[slow_period - fast_period:]) / fast_period}
+        del state["warm"]
+    else:
+        _ema(state["slow"], x, slow_period)
+        _ema(state["fast"], x, fast_period)
+
+    line = state["fast"]["ema"] - state["slow"]["ema"]
+    signal = _ema(state.setdefault("signal", {}), line, int(ind['signal_period']))
+    if math.isnan(signal):
+        return NAN
+    return line if ind['type'] == "line" else signal
+
+def step_kalman(state, bar, ind):
+    # scalar form of the pykalman filter in KALMAN, the first observation is corrected without a prediction
+    x = bar[ind['input']]
+    if "mean" not in state:
+        mean, covariance = x, 1.0
+    else:
+        mean, covariance = state["mean"], state["covariance"] + 0.01
+
+    gain = covariance / (covariance + 1.0 / int(ind['period']))
+    state["mean"] = mean + gain * (x - mean)
+    state["covariance"] = covariance - gain * covariance
+    return state["mean"]
+
+def step_kalman_colour_transitions(state, bar, ind):
+    prev = state.get("mean", NAN)
+    mean = step_kalman(state, bar, ind)
+    return _transition(state, mean - prev >= 0)
+
+def step_harsi_flip(state, bar, ind):
+    period, smoothing = int(ind['period']), float(ind['smoothing'])
+    c = _rsi(state.setdefault("close", {}), bar["Close"], period) - 50
+    h = _rsi(state.setdefault("high", {}), bar["High"], period) - 50
+    l = _rsi(state.setdefault("low", {}), bar["Low"], period) - 50
+
+    o = state.get("c", NAN)
+    close_ha = (o + (h if h > l else l) + (l if l < h else h) + c) / 4
+    if math.isnan(state.get("open_ha", NAN)):
+        open_ha = (o + c) / 2 if not math.isnan(close_ha) else NAN
+    else:
+        open_ha = smoothing / (smoothing + 1) * state["open_ha"] + 1 / (smoothing + 1) * state["close_ha"]
+
+    state.update(c=c, open_ha=open_ha, close_ha=close_ha)
+    return _transition(state, close_ha > open_ha)
+
+def step_srocst(state, bar, ind):
+    roc_len, stoch_len = int(ind['roc_length']), int(ind['k_length'])
+    sharp, k_period = float(ind['sharpness']), float(ind['filter_period'])
+
+    # Kalman filter with velocity on the source column
+    x = bar[ind['kalman_src']]
+    if "kf" not in state:
+        kf, vel = x, 0.0
+    else:
+        d = x - state["kf"]
+        e = state["kf"] + d * float(np.sqrt(sharp * k_period / 100))
+        vel = state["vel"] + d * (k_period / 100)
+        kf = e + vel
+    state.update(kf=kf, vel=vel)
+
+    history = _window(state, "kf_history", kf, roc_len + 1)
+    roc = NAN if history is None else _divide(100 * (kf - history[0]), history[0])
+
+    # stochastic %D, the rolling means are summed over their window
+    lows = _window(state, "lows", bar["Low"], stoch_len)
+    highs = _window(state, "highs", bar["High"], stoch_len)
+    k_raw = NAN if lows is None else _divide(bar["Close"] - min(lows), max(highs) - min(lows)) * 100
+    k_window = _window(state, "k_raw", k_raw, int(ind['k_smoothing']))
+    k_sma = NAN if k_window is None else sum(k_window) / len(k_window)
+    d_window = _window(state, "k_sma", k_sma, int(ind['d_smoothing']))
+    d_sma = NAN if d_window is None else sum(d_window) / len(d_window)
+
+    blend = _ema(state.setdefault("ema", {}), (roc + d_sma) / 2, int(ind['smoothing_length']))
+
+    # white while the line rises, NaN bars count as blue
+    white = blend > state.get("blend", NAN)
+    state["blend"] = blend
+    return _transition(state, white)
+
+
+STREAMING_INDICATORS = {
+    "ema": step_ema,
+    "rsi": step_rsi,
+    "atr": step_atr,
+    "macd": step_macd,
+    "kalman": step_kalman,
+    "kalman_colour_transtitions": step_kalman_colour_transitions,
+    "HARSI_Flip": step_harsi_flip,
+    "SROCST": step_srocst,
+}
+
+def is_streamable(ind):
+    """
+    Whether the indicator's series can be advanced bar by bar. Nested inputs are not, they are computed in full.
+    """
+    func = ind.get('ind')
+    if func not in STREAMING_INDICATORS or ind.get('input') not in BAR_COLUMNS:
+        return False
+    if func == "macd":
+        return ind.get('type') in ["line", "signal"]
+    if func == "SROCST":
+        return ind.get('ma_type', '').lower() == "ema" and ind.get('kalman_src') in BAR_COLUMNS
+    return True
+
+
+# PERSISTED STATE
+# data/{ticker}_{timeframe}.indicators.json maps indicator_key -> entry, an entry holding the state after the
+# last stored bar, the state before it (to redo the last bar when the provider revises it), the last outputs
+# and the bar count / last timestamp / first and last bar it was computed on, which tell whether it still matches the history
+
+def indicator_state_path(stock, timeframe, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{stock}_{timeframe}.indicators.json")
+
+def load_indicator_state(stock, timeframe, data_dir=DATA_DIR):
+    path = indicator_state_path(stock, timeframe, data_dir)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"[Indicator State] Discarding unreadable state for {stock} ({timeframe}): {e}")
+        return {}
+
+def save_indicator_state(stock, timeframe, entries, data_dir=DATA_DIR):
+    path = indicator_state_path(stock, timeframe, data_dir)
+    os.makedirs(data_dir, exist_ok=True)
+    with open(path + ".tmp", "w") as file:
+        json.dump(entries, file)
+    os.replace(path + ".tmp", path)
+
+def new_entry(ind):
+    ind = {k: v for k, v in ind.items() if k not in ('specifier', 'operable')}
+    return {"ind": ind, "state": {}, "prev": None, "tail": [], "bars": 0, "ts": None, "bar": None, "first": None}
+
+def _bars(df):
+    return {col: df[col].to_numpy(dtype=np.float64) for col in BAR_COLUMNS}
+
+def _bar(bars, timestamps, i):
+    return [int(timestamps[i])] + [float(bars[col][i]) for col in BAR_COLUMNS]
+
+def advance_entry(entry, df, bars=None):
+    """
+    Brings an entry up to the end of df, stepping only the bars it has not seen.
+    \nReturns False when df no longer extends the history the entry was computed on (rewritten history),
+    the entry then has to be rebuilt with a cold start.
+    """
+    n = len(df)
+    timestamps = df[TIMESTAMP_COLUMN].to_numpy()
+    bars = bars if bars is not None else _bars(df)
+    start = entry["bars"]
+
+    if start > 0:
+        if start > n or int(timestamps[start - 1]) != entry["ts"]:
+            return False
+        # a back-adjusted history (splits, dividends) keeps its last bar but rescales the first one
+        if not np.array_equal(_bar(bars, timestamps, 0), entry["first"], equal_nan=True):
+            return False
+        if not np.array_equal(_bar(bars, timestamps, start - 1), entry["bar"], equal_nan=True):
+            # the last bar was revised, redo it from the state before it
+            if entry["prev"] is None:
+                return False
+            entry["state"] = entry["prev"]
+            entry["tail"] = entry["tail"][:-1]
+            start -= 1
+
+    step = STREAMING_INDICATORS[entry["ind"]["ind"]]
+    for i in range(start, n):
+        entry["prev"] = copy.deepcopy(entry["state"])
+        value = step(entry["state"], {col: float(bars[col][i]) for col in BAR_COLUMNS}, entry["ind"])
+        entry["tail"] = (entry["tail"] + [float(value)])[-INDICATOR_STATE_TAIL:]
+
+    if n > start:
+        entry["bars"] = n
+        entry["ts"] = int(timestamps[-1])
+        entry["bar"] = _bar(bars, timestamps, n - 1)
+        entry["first"] = _bar(bars, timestamps, 0)
+    return True
+
+def advance_indicator_state(stock, timeframe, df, data_dir=DATA_DIR):
+    """
+    Steps every tracked indicator of stock over the bars appended to df since the last run,
+    dropping the ones whose history was rewritten (they cold start on the next alert check)
+    """
+    entries = load_indicator_state(stock, timeframe, data_dir)
+    if not entries or df is None:
+        return
+
+    bars = _bars(df)
+    advanced = {key: entry for key, entry in entries.items() if advance_entry(entry, df, bars)}
+    save_indicator_state(stock, timeframe, advanced, data_dir)
+
+
+class IndicatorStateCache(dict):
+    """
+    Indicator cache for check_alerts prefilled with the last outputs of every tracked indicator, so reading
+    [-1] or [-2] of a streamed indicator costs nothing. Each key is a Series holding only those last outputs,
+    indexed by bar position, a full series is still computed when a specifier reaches past them.
+    \nsave() keeps state for the streamable indicators tracked during the run and drops the rest.
+    """
+    def __init__(self, stock, timeframe, df, data_dir=DATA_DIR):
+        super().__init__()
+        self.stock = stock
+        self.timeframe = timeframe
+        self.df = df
+        self.data_dir = data_dir
+        self.bars = _bars(df)
+        self.tracked = {}
+        self.entries = {}
+
+        for key, entry in load_indicator_state(stock, timeframe, data_dir).items():
+            if advance_entry(entry, df, self.bars) and entry["bars"] == len(df):
+                self.entries[key] = entry
+                self[key] = self._tail(entry)
+
+    def _tail(self, entry):
+        tail = entry["tail"]
+        return pd.Series(tail, index=range(len(self.df) - len(tail), len(self.df)), dtype="float64")
+
+    def track(self, key, ind):
+        if is_streamable(ind):
+            self.tracked[key] = ind
+
+    def save(self):
+        entries = {}
+        for key, ind in self.tracked.items():
+            entry = self.entries.get(key)
+            if entry is None:
+                # cold start, every bar of the history is stepped once
+                entry = new_entry(ind)
+                advance_entry(entry, self.df, self.bars)
+            entries[key] = entry
+        save_indicator_state(self.stock, self.timeframe, entries, self.data_dir)
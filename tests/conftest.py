@@ -0,0 +1,14 @@
+import os
+import sys
+import types
+
+# The modules import each other as stockalerter.*, the checkout is that package whatever its directory is called
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "stockalerter" not in sys.modules:
+    package = types.ModuleType("stockalerter")
+    package.__path__ = [ROOT]
+    sys.modules["stockalerter"] = package
+
+# utils builds its Polygon client on import, the tests never reach the real API
+os.environ.setdefault("POLYGON_API_KEY", "test")
@@ -0,0 +1,70 @@
+import os
+import threading
+import pytest
+from stockalerter import utils
+from stockalerter.alert_store import JsonAlertStore, SqliteAlertStore
+
+
+def make_alert(alert_id, condition="Close[-1] > 10"):
+    return {
+        "alert_id": alert_id, "name": "test", "stock_name": "SAP", "ticker": "SAP.DE",
+        "conditions": [{"index": 1, "conditions": condition}], "combination_logic": "1",
+        "last_triggered": "", "action": "Buy", "timeframe": "1d", "exchange": "DE",
+    }
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "json":
+        return JsonAlertStore(os.path.join(tmp_path, "alerts.json"))
+    return SqliteAlertStore(os.path.join(tmp_path, "alerts.db"))
+
+
+def test_duplicate_add_is_rejected(store):
+    store.add(make_alert("a1"))
+    with pytest.raises(ValueError, match="already exists"):
+        store.add(make_alert("a2", condition="Close[-1]>10"))
+    assert [alert["alert_id"] for alert in store.load()] == ["a1"]
+
+def test_concurrent_duplicates_store_one_alert(store, monkeypatch):
+    # both saves are held after their duplicate check until the other one got there too (or cannot)
+    barrier = threading.Barrier(2, timeout=0.5)
+    find = store.find
+    def find_then_wait(fingerprint):
+        found = find(fingerprint)
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        return found
+    monkeypatch.setattr(store, "find", find_then_wait)
+
+    errors = []
+    def add(i):
+        try:
+            store.add(make_alert(f"a{i}"))
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(store.load()) == 1
+    assert len(errors) == 1
+
+def test_save_alert_leaves_the_duplicate_check_to_the_store(store, monkeypatch):
+    finds = []
+    find = store.find
+    monkeypatch.setattr(store, "find", lambda fingerprint: finds.append(fingerprint) or find(fingerprint))
+    monkeypatch.setattr(utils, "get_alert_store", lambda: store)
+
+    args = ("test", [{"index": 1, "conditions": "Close[-1] > 10"}], "1", "SAP.DE", "SAP", "DE", "1d", "", "Buy")
+    utils.save_alert(*args)
+    with pytest.raises(ValueError, match="already exists"):
+        utils.save_alert(*args)
+
+    assert len(store.load()) == 1
+    # only the JSON store looks the fingerprint up, once per save, SQLite relies on its unique index
+    assert len(finds) == (2 if isinstance(store, JsonAlertStore) else 0)
@@ -0,0 +1,92 @@
+import itertools
+import re
+import pytest
+from stockalerter.alert_syntax import (canonical_condition, tokenize_combination, compile_combination,
+                                       combination_references, validate_combination)
+
+
+# Combination logic as the alert checks evaluated it before the parser, Python's own and/or/not
+def eval_combination(expr, bools):
+    for i in sorted({int(num) for num in re.findall(r"\b\d+\b", expr)}, reverse=True):
+        expr = re.sub(rf"\b{i}\b", f"var_{i}", expr)
+    return eval(expr, {}, {f"var_{i + 1}": value for i, value in enumerate(bools)})
+
+def evaluate(tree, bools):
+    kind = tree[0]
+    if kind == "ref":
+        return bools[tree[1] - 1]
+    if kind == "not":
+        return not evaluate(tree[1], bools)
+    operands = [evaluate(node, bools) for node in tree[1]]
+    return all(operands) if kind == "and" else any(operands)
+
+
+def test_canonical_condition_drops_whitespace():
+    assert canonical_condition("rsi(period = 14)[-1] > 70") == canonical_condition("rsi(period=14)[-1]>70")
+
+
+# TOKENIZER
+
+def test_tokenize_combination():
+    assert tokenize_combination("1 and (12 or not 3)") == [1, "and", "(", 12, "or", "not", 3, ")"]
+    assert tokenize_combination("1AND(2)") == [1, "and", "(", 2, ")"]
+    assert tokenize_combination("") == []
+
+@pytest.mark.parametrize("expr", ["1 xor 2", "1 && 2", "1 and 2;", "1 + 2", "__import__('os')"])
+def test_tokenize_rejects_unknown_input(expr):
+    with pytest.raises(ValueError):
+        tokenize_combination(expr)
+
+
+# PARSER
+
+def test_precedence_is_not_then_and_then_or():
+    assert compile_combination("1 or 2 and 3") == ("or", (("ref", 1), ("and", (("ref", 2), ("ref", 3)))))
+    assert compile_combination("not 1 and 2") == ("and", (("not", ("ref", 1)), ("ref", 2)))
+    assert compile_combination("not not 1") == ("not", ("not", ("ref", 1)))
+
+def test_parentheses_override_precedence():
+    assert compile_combination("(1 or 2) and 3") == ("and", (("or", (("ref", 1), ("ref", 2))), ("ref", 3)))
+    assert compile_combination("((1))") == ("ref", 1)
+    assert compile_combination("not (1 or 2)") == ("not", ("or", (("ref", 1), ("ref", 2))))
+
+def test_chains_are_flattened():
+    assert compile_combination("1 and 2 and 3") == ("and", (("ref", 1), ("ref", 2), ("ref", 3)))
+
+def test_keywords_are_case_insensitive():
+    assert compile_combination("NOT 1 AND 2 Or 3") == compile_combination("not 1 and 2 or 3")
+
+def test_empty_logic_means_condition_one():
+    assert compile_combination("") == ("ref", 1)
+    assert compile_combination("   ") == ("ref", 1)
+
+@pytest.mark.parametrize("expr", ["1 and", "and 1", "1 2", "(1 or 2", "1 or 2)", "()", "not", "1 and or 2", "1 (2)"])
+def test_malformed_logic_is_rejected(expr):
+    with pytest.raises(ValueError):
+        compile_combination(expr)
+
+@pytest.mark.parametrize("expr", [
+    "1", "not 1", "1 and 2", "1 or 2", "1 or 2 and 3", "not 1 or 2 and not 3", "(1 or 2) and (3 or not 1)",
+    "not (1 and 2) or 3", "1 and 2 or 3 and 4", "not not 2 and (4 or 3)",
+])
+def test_matches_python_evaluation(expr):
+    tree = compile_combination(expr)
+    for bools in itertools.product([False, True], repeat=4):
+        assert evaluate(tree, bools) == eval_combination(expr, bools), bools
+
+
+# REFERENCES
+
+def test_combination_references():
+    assert combination_references(compile_combination("1 and (3 or not 1)")) == {1, 3}
+
+def test_unknown_condition_numbers_are_rejected():
+    with pytest.raises(ValueError, match="out of range"):
+        validate_combination("1 and 3", 2)
+    with pytest.raises(ValueError, match="out of range"):
+        validate_combination("0 or 1", 2)
+
+def test_unused_conditions_are_allowed():
+    # as before the parser, conditions the logic leaves out are simply not evaluated
+    assert validate_combination("1 and 3", 3) == compile_combination("1 and 3")
+    assert validate_combination("", 4) == ("ref", 1)
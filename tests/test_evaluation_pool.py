@@ -0,0 +1,31 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from stockalerter import evaluation_pool
+
+
+def evaluate_stub(stock, alerts, timeframe):
+    return [(alerts[0]["alert_id"], "Close > 1", None)], [], {}
+
+@pytest.fixture
+def pool(monkeypatch):
+    # forked workers see the stubs, spawned ones would import the modules again
+    monkeypatch.setattr(evaluation_pool, "EVALUATE_START_METHOD", "fork")
+    monkeypatch.setattr(evaluation_pool, "EVALUATE_PROCESSES", 1)
+    monkeypatch.setattr(evaluation_pool, "_pool", None)
+    monkeypatch.setattr(evaluation_pool, "alerts_for_stock", lambda stock, alert_data, timeframe: [{"alert_id": "a1"}])
+    monkeypatch.setattr(evaluation_pool, "evaluate_stock_alerts", evaluate_stub)
+    yield
+    if evaluation_pool._pool is not None:
+        evaluation_pool._pool.shutdown()
+
+def test_broken_pool_is_replaced(pool):
+    broken = evaluation_pool.get_evaluation_pool()
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result()
+
+    notified = []
+    evaluation_pool.check_alerts_in_pool("SAP.DE", [], "daily", notify=lambda *args: notified.append(args))
+
+    assert evaluation_pool._pool is not broken
+    assert [(stock, alert["alert_id"], condition) for stock, alert, condition, _ in notified] == [("SAP.DE", "a1", "Close > 1")]
@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stockalerter import indicators_lib
+from stockalerter.indicators_lib import (RSI, SMA, EMA, HMA, ATR, HARSI_Flip, HARSI_CANDLES, SROCST, SROCST_LINE,
+                                         kalman_velocity_filter, SUPER_TREND, SUPER_TREND_COLOURS, SUPER_TREND_COLOUR_TRANSITIONS)
+
+
+# REFERENCE
+# HARSI_Flip as it was before the HA open recursion was vectorized, kept frozen to check the new one against
+
+def legacy_HARSI_Flip(df, timeperiod, smoothing):
+    def calculate_harsi_base(df, timeperiod, smoothing):
+        c = pd.Series(RSI(df, timeperiod, "Close"), index=df.index) - 50
+        h = pd.Series(RSI(df, timeperiod, "High"),   index=df.index) - 50
+        l = pd.Series(RSI(df, timeperiod, "Low"),    index=df.index) - 50
+
+        o = c.shift(1)
+
+        H = np.maximum(h, l)
+        L = np.minimum(h, l)
+
+        close_ha = (o + H + L + c) / 4
+
+        open_ha = pd.Series(index=df.index, dtype=float)
+
+        first = close_ha.first_valid_index()
+        if first is None:
+            return open_ha, pd.Series(np.nan, df.index), pd.Series(np.nan, df.index), close_ha
+
+        open_ha.loc[first] = (o.loc[first] + c.loc[first]) / 2
+
+        idxs = list(df.index)
+        start = idxs.index(first)
+        for i in range(start + 1, len(idxs)):
+            prev = idxs[i - 1]
+            cur  = idxs[i]
+            open_ha.loc[cur] = (open_ha.loc[prev] * smoothing + close_ha.loc[prev]) / (smoothing + 1)
+
+        high_ha = pd.Series(np.maximum.reduce([H, open_ha, close_ha]), index=df.index)
+        low_ha  = pd.Series(np.minimum.reduce([L, open_ha, close_ha]), index=df.index)
+
+        return open_ha, high_ha, low_ha, close_ha
+
+    def har_si_colors(df, timeperiod, smoothing):
+        o, h, l, c = calculate_harsi_base(df, timeperiod, smoothing)
+        return pd.Series(np.where(c > o, "green", "red"), index=df.index)
+
+    def color_transitions(colors):
+        prev = colors.shift(1)
+        result = pd.Series(0, index=colors.index)
+        result[(prev == "green") & (colors == "red")] = 1
+        result[(prev == "red") & (colors == "green")] = 2
+        return result
+
+    return color_transitions(har_si_colors(df, timeperiod, smoothing))
+
+
+# SROCST as it was before the Kalman loop moved to float64 arrays
+
+def legacy_SROCST(df, ma_type='EMA', lsma_off=0, smooth_len=12, kal_src='Close', sharp=25.0, k_period=1.0, roc_len=9, stoch_len=14, stoch_k_smooth=1, stoch_d_smooth=3, line=False):
+    def f_ma(ma_type, df, period, src, lsma_off=0):
+        ma_type = ma_type.lower()
+        if ma_type=='sma': return SMA(df, period, src)
+        if ma_type=='ema': return EMA(df, period, src)
+        if ma_type=='hma': return HMA(df, period, src)
+        raise ValueError(type)
+
+    def calc_srocst_line(df, ma_type='EMA', lsma_off=0, smooth_len=12, kal_src='Close', sharp=25.0, k_period=1.0, roc_len=9, stoch_len=14, stoch_k_smooth=1, stoch_d_smooth=3):
+        kf=pd.Series(index=df.index,dtype=float)
+        vel=pd.Series(0.0,index=df.index)
+        for i in range(len(df)):
+            if i==0:
+                kf.iat[0]=df[kal_src].iat[0]
+            else:
+                d=df[kal_src].iat[i]-kf.iat[i-1]
+                e=kf.iat[i-1]+d*np.sqrt(sharp*k_period/100)
+                vel.iat[i]=vel.iat[i-1]+d*(k_period/100)
+                kf.iat[i]=e+vel.iat[i]
+        roc=100*(kf-kf.shift(roc_len))/kf.shift(roc_len)
+        low=df['Low'].rolling(stoch_len).min()
+        high=df['High'].rolling(stoch_len).max()
+        k_raw=(df['Close']-low)/(high-low)*100
+        k_sma=k_raw.rolling(stoch_k_smooth).mean()
+        d_sma=k_sma.rolling(stoch_d_smooth).mean()
+        blend=f_ma(ma_type,df,smooth_len,(roc+d_sma)/2,lsma_off)
+        return blend
+
+    def calc_srocst_colors(blend):
+        return pd.Series(np.where(blend>blend.shift(1),'white','blue'),index=blend.index)
+
+    def color_transition_codes(colors: pd.Series) -> pd.Series:
+        prev = colors.shift(1)
+        codes = pd.Series(0, index=colors.index)
+        codes[(prev == 'white') & (colors == 'blue')] = 1
+        codes[(prev == 'blue') & (colors == 'white')] = 2
+        return codes
+
+    blend = calc_srocst_line(df, ma_type, lsma_off, smooth_len, kal_src, sharp, k_period, roc_len, stoch_len, stoch_k_smooth, stoch_d_smooth)
+    if line:
+        return blend
+    return color_transition_codes(calc_srocst_colors(blend))
+
+def legacy_kalman(src, sharp, k_period):
+    src = pd.Series(src)
+    kf = pd.Series(index=src.index, dtype=float)
+    vel = pd.Series(0.0, index=src.index)
+    for i in range(len(src)):
+        if i == 0:
+            kf.iat[0] = src.iat[0]
+        else:
+            d = src.iat[i] - kf.iat[i-1]
+            e = kf.iat[i-1] + d * np.sqrt(sharp * k_period / 100)
+            vel.iat[i] = vel.iat[i-1] + d * (k_period / 100)
+            kf.iat[i] = e + vel.iat[i]
+    return kf.to_numpy()
+
+
+# The Supertrend family as it was before the single-pass kernel
+
+def legacy_SUPER_TREND(df, atr_period, multiplier):
+    atr = ATR(df, atr_period)
+    hl2 = (df["High"] + df["Low"]) / 2
+
+    basic_upper = hl2 + multiplier * atr
+    basic_lower = hl2 - multiplier * atr
+
+    final_upper = basic_upper.copy()
+    final_lower = basic_lower.copy()
+    for i in range(1, len(df)):
+        if df["Close"].iat[i-1] <= final_upper.iat[i-1]:
+            final_upper.iat[i] = min(basic_upper.iat[i], final_upper.iat[i-1])
+        else:
+            final_upper.iat[i] = basic_upper.iat[i]
+        if df["Close"].iat[i-1] >= final_lower.iat[i-1]:
+            final_lower.iat[i] = max(basic_lower.iat[i], final_lower.iat[i-1])
+        else:
+            final_lower.iat[i] = basic_lower.iat[i]
+
+    trend = pd.Series(index=df.index, dtype=int)
+    trend.iat[0] = 1
+    for i in range(1, len(df)):
+        if df["Close"].iat[i] > final_upper.iat[i-1]:
+            trend.iat[i] = 1
+        elif df["Close"].iat[i] < final_lower.iat[i-1]:
+            trend.iat[i] = -1
+        else:
+            trend.iat[i] = trend.iat[i-1]
+    return trend
+
+def legacy_SUPER_TREND_COLOURS(df, atr_period, multiplier):
+    tr = legacy_SUPER_TREND(df, atr_period, multiplier)
+    return pd.Series(np.where(tr.eq(1), "green", "red"), index=df.index)
+
+def legacy_SUPER_TREND_COLOUR_TRANSITIONS(df, atr_period, multiplier):
+    colours = legacy_SUPER_TREND_COLOURS(df, atr_period, multiplier)
+    prev = colours.shift(1)
+    codes = pd.Series(0, index=df.index, dtype=int)
+    codes[(prev == "green") & (colours == "red")]   = 1
+    codes[(prev == "red")   & (colours == "green")] = 2
+    return codes
+
+
+# Random walk OHLC with a date index, like the frames loaded from the price store
+def random_ohlc(n, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    open_ = close * np.exp(rng.normal(0, 0.01, n))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.01, n)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.01, n)))
+    index = pd.date_range("2020-01-01", periods=n, freq="B")
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": rng.integers(1, 10**6, n).astype(float)}, index=index)
+
+
+SERIES = [(seed, int(n)) for seed, n in enumerate(np.random.default_rng(0).integers(3, 401, 60))]
+
+@pytest.mark.parametrize("seed,n", SERIES)
+@pytest.mark.parametrize("timeperiod,smoothing", [(14, 1), (10, 3), (2, 7)])
+def test_harsi_flip_matches_legacy(seed, n, timeperiod, smoothing):
+    df = random_ohlc(n, seed)
+    expected = legacy_HARSI_Flip(df, timeperiod, smoothing)
+    result = HARSI_Flip(df, timeperiod, smoothing)
+    assert result.index.equals(df.index)
+    assert result.tolist() == expected.tolist()
+
+def test_harsi_flip_shorter_than_rsi_period():
+    df = random_ohlc(5, 1)
+    assert HARSI_Flip(df, 14, 1).tolist() == [0] * 5 == legacy_HARSI_Flip(df, 14, 1).tolist()
+
+def test_harsi_candles_follow_the_recursion():
+    df = random_ohlc(200, 7)
+    smoothing = 3
+    open_ha, close_ha, _ = HARSI_CANDLES(df, 14, smoothing)
+    first = np.flatnonzero(~np.isnan(close_ha))[0]
+    assert np.isnan(open_ha[:first]).all()
+    for i in range(first + 1, len(open_ha)):
+        assert open_ha[i] == pytest.approx((open_ha[i - 1] * smoothing + close_ha[i - 1]) / (smoothing + 1), rel=1e-12)
+
+
+# SROCST
+
+@pytest.mark.parametrize("seed,n", SERIES[::3])
+@pytest.mark.parametrize("sharp,k_period", [(25.0, 1.0), (60.0, 3.5)])
+def test_kalman_velocity_filter_matches_legacy(seed, n, sharp, k_period):
+    close = random_ohlc(n, seed)["Close"]
+    np.testing.assert_array_equal(kalman_velocity_filter(close, sharp, k_period), legacy_kalman(close, sharp, k_period))
+
+@pytest.mark.parametrize("seed,n", SERIES[::3])
+@pytest.mark.parametrize("ma_type", ["EMA", "SMA", "HMA"])
+def test_srocst_matches_legacy(seed, n, ma_type):
+    df = random_ohlc(n, seed)
+    np.testing.assert_array_equal(SROCST_LINE(df, ma_type), legacy_SROCST(df, ma_type, line=True).to_numpy())
+    assert SROCST(df, ma_type).tolist() == legacy_SROCST(df, ma_type).tolist()
+
+
+# SUPER_TREND
+
+@pytest.fixture(params=["python", "numba"])
+def super_trend_kernel(request, monkeypatch):
+    # the loop runs compiled when numba is installed and on Python floats otherwise, both must match
+    if request.param == "python":
+        monkeypatch.setattr(indicators_lib, "_super_trend_jit", None)
+    elif indicators_lib._super_trend_jit is None:
+        pytest.skip("numba is not installed")
+    return request.param
+
+@pytest.mark.parametrize("seed,n", SERIES[::3] + [(101, 1), (102, 2), (103, 5)])
+@pytest.mark.parametrize("atr_period,multiplier", [(10, 3.0), (3, 1.5), (1, 2.0)])
+def test_super_trend_matches_legacy(super_trend_kernel, seed, n, atr_period, multiplier):
+    df = random_ohlc(n, seed)
+    pd.testing.assert_series_equal(SUPER_TREND(df, atr_period, multiplier), legacy_SUPER_TREND(df, atr_period, multiplier))
+    pd.testing.assert_series_equal(SUPER_TREND_COLOURS(df, atr_period, multiplier), legacy_SUPER_TREND_COLOURS(df, atr_period, multiplier))
+    pd.testing.assert_series_equal(SUPER_TREND_COLOUR_TRANSITIONS(df, atr_period, multiplier), legacy_SUPER_TREND_COLOUR_TRANSITIONS(df, atr_period, multiplier))
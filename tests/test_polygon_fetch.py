@@ -0,0 +1,112 @@
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import pandas as pd
+import pytest
+from polygon import RESTClient
+from stockalerter import utils
+from stockalerter.http_pool import pool_polygon_client
+from stockalerter.price_store import get_price_store, to_price_frame
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "polygon")
+
+# Recorded Polygon responses, served by path
+ROUTES = [
+    (re.compile(r"^/v2/aggs/grouped/locale/us/market/stocks/\d{4}-\d{2}-\d{2}$"), "grouped_daily.json"),
+    (re.compile(r"^/v2/aggs/ticker/(?P<ticker>[A-Z]+)/range/1/day/[\d-]+/[\d-]+$"), "aggs_{ticker}.json"),
+]
+
+
+# FAKE POLYGON API
+
+class PolygonFixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        self.server.requests.append(path)
+        for pattern, name in ROUTES:
+            match = pattern.match(path)
+            fixture = match and os.path.join(FIXTURES, name.format(**match.groupdict()))
+            if fixture and os.path.exists(fixture):
+                with open(fixture, "rb") as file:
+                    body = file.read()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+        self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def polygon_server(monkeypatch):
+    """
+    A local server answering with the recorded fixtures, utils' client pointed at it like POLYGON_API_BASE does
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PolygonFixtureHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(utils, "client", pool_polygon_client(RESTClient(api_key="test", base=base)))
+    monkeypatch.setattr(utils, "POLYGON_GROUPED_DAILY", True)
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def price_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return get_price_store()
+
+def store_bar(store, stock, date):
+    store.save(stock, "daily", to_price_frame(pd.DataFrame({"Close": [1.0]}, index=[date])))
+
+
+# TESTS
+
+def test_grouped_request_only_for_tickers_one_session_behind(polygon_server, price_store):
+    behind = (pd.Timestamp(utils.previous_session_date()) - pd.offsets.BDay(1)).strftime("%Y-%m-%d")
+    store_bar(price_store, "AAPL", utils.previous_session_date())
+    store_bar(price_store, "MSFT", behind)
+
+    frames = utils.get_latest_stock_data_batch(["AAPL", "MSFT", "NVDA"], "US", "day")
+
+    today = pd.Timestamp.now(tz="America/New_York").strftime("%Y-%m-%d")
+    grouped = [path for path in polygon_server.requests if "/grouped/" in path]
+    per_ticker = {path.split("/")[4]: path.split("/")[-2] for path in polygon_server.requests if "/ticker/" in path}
+    assert grouped == [f"/v2/aggs/grouped/locale/us/market/stocks/{today}"]
+    # MSFT missed one run and fetches from its last stored bar, NVDA has no history and fetches the last year
+    assert set(per_ticker) == {"MSFT", "NVDA"}
+    assert per_ticker["MSFT"] == behind
+    assert per_ticker["NVDA"] < behind
+
+    assert set(frames) == {"AAPL", "MSFT", "NVDA"}
+    assert len(frames["AAPL"]) == 1
+    assert len(frames["MSFT"]) == 3
+    assert len(frames["NVDA"]) == 4
+
+def test_grouped_bars_are_moved_to_midnight_new_york(polygon_server, price_store):
+    store_bar(price_store, "AAPL", utils.previous_session_date())
+
+    frames = utils.get_latest_stock_data_batch(["AAPL"], "US", "day")
+
+    # the grouped bar is stamped at the 16:00 close, per-ticker daily bars at midnight
+    bar = frames["AAPL"]
+    assert list(bar.index) == ["10-10-2024 00:00:00 EDT"]
+    assert "T" not in bar.columns
+    assert bar["Close"].iloc[0] == 229.04
+    assert "TSLA" not in frames
+
+def test_grouped_and_per_ticker_bars_of_a_session_share_a_timestamp(polygon_server):
+    grouped = utils.grab_grouped_daily_polygon(["MSFT"], date="2024-10-10")["MSFT"]
+    per_ticker = utils.grab_new_data_polygon("MSFT", timespan="day")
+
+    # the same session from either request lands on one stored bar instead of two
+    assert to_price_frame(grouped)["Date"].iloc[0] == to_price_frame(per_ticker)["Date"].iloc[-1]
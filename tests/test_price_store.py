@@ -0,0 +1,141 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from stockalerter.price_store import ColumnPriceStore, CsvPriceStore, PRICE_STORES, bars_since, migrate_csv_prices, to_price_frame
+
+
+# Provider style frame, one bar per business day from start with prices taken from closes
+def provider_frame(start, closes):
+    dates = pd.date_range(start, periods=len(closes), freq="B")
+    closes = np.asarray(closes, dtype=float)
+    return pd.DataFrame({
+        "Open": closes - 0.5, "High": closes + 1, "Low": closes - 1, "Close": closes,
+        "Volume": np.arange(1, len(closes) + 1) * 1000.0,
+    }, index=dates.strftime("%d-%m-%Y 00:00:00 EDT"))
+
+@pytest.fixture(params=list(PRICE_STORES))
+def store(request, tmp_path):
+    return PRICE_STORES[request.param](str(tmp_path))
+
+
+# APPEND
+
+def test_first_append_saves_the_frame(store):
+    df = to_price_frame(provider_frame("2025-03-03", [10, 11, 12]))
+
+    assert store.last_timestamp("SAP.DE", "daily") is None
+    assert store.append("SAP.DE", "daily", df) == 3
+    pd.testing.assert_frame_equal(store.load("SAP.DE", "daily"), df, check_like=True)
+    assert store.last_timestamp("SAP.DE", "daily") == df["Date"].iloc[-1]
+
+def test_overlapping_append_replaces_the_last_bar(store):
+    store.save("SAP.DE", "daily", to_price_frame(provider_frame("2025-03-03", [10, 11, 12])))
+
+    # the refetch starts at the stored last bar, which was partial when stored
+    written = store.append("SAP.DE", "daily", to_price_frame(provider_frame("2025-03-05", [12.5, 13, 14])))
+
+    stored = store.load("SAP.DE", "daily")
+    assert written == 3
+    assert stored["Close"].tolist() == [10, 11, 12.5, 13, 14]
+    assert stored["Date"].is_unique and stored["Date"].is_monotonic_increasing
+    assert store.last_timestamp("SAP.DE", "daily") == stored["Date"].iloc[-1]
+
+def test_out_of_order_append_keeps_only_newer_bars(store):
+    store.save("SAP.DE", "daily", to_price_frame(provider_frame("2025-03-03", [10, 11, 12])))
+
+    # unsorted provider rows reaching back before the stored history
+    fetched = provider_frame("2025-02-27", [8, 9, 10.5, 11.5, 12, 13]).iloc[[5, 0, 3, 1, 4, 2]]
+    written = store.append("SAP.DE", "daily", to_price_frame(fetched))
+
+    stored = store.load("SAP.DE", "daily")
+    assert written == 2
+    assert stored["Close"].tolist() == [10, 11, 12, 13]
+    assert stored["Date"].is_monotonic_increasing
+
+def test_append_of_older_bars_only_writes_nothing(store):
+    df = to_price_frame(provider_frame("2025-03-03", [10, 11, 12]))
+    store.save("SAP.DE", "daily", df)
+
+    assert store.append("SAP.DE", "daily", to_price_frame(provider_frame("2025-02-24", [1, 2, 3]))) == 0
+    pd.testing.assert_frame_equal(store.load("SAP.DE", "daily"), df, check_like=True)
+
+def test_append_fills_missing_columns_with_nan(store):
+    store.save("SAP.DE", "daily", to_price_frame(provider_frame("2025-03-03", [10, 11])))
+
+    new = to_price_frame(provider_frame("2025-03-05", [12]).drop(columns=["Volume"]))
+    store.append("SAP.DE", "daily", new)
+
+    stored = store.load("SAP.DE", "daily")
+    assert stored["Close"].tolist() == [10, 11, 12]
+    assert np.isnan(stored["Volume"].iloc[-1])
+
+def test_column_store_appends_without_rewriting_history(tmp_path):
+    store = ColumnPriceStore(str(tmp_path))
+    store.save("SAP.DE", "daily", to_price_frame(provider_frame("2025-03-03", [10, 11, 12])))
+    mapped = store.load("SAP.DE", "daily")
+
+    store.append("SAP.DE", "daily", to_price_frame(provider_frame("2025-03-06", [13])))
+
+    # a frame loaded before the append keeps its rows, the new row only shows up on the next load
+    assert mapped["Close"].tolist() == [10, 11, 12]
+    assert store.read_meta("SAP.DE", "daily")["rows"] == 4
+    assert store.load("SAP.DE", "daily")["Close"].tolist() == [10, 11, 12, 13]
+
+
+# BARS SINCE
+
+def test_bars_since_splits_at_the_last_stored_bar():
+    df = to_price_frame(provider_frame("2025-03-03", [10, 11, 12, 13]))
+    timestamps = df["Date"].tolist()
+
+    assert bars_since(df, None)[0] is df
+    assert bars_since(df, None)[1] is False
+
+    bars, replaces_last = bars_since(df, timestamps[1])
+    assert bars["Close"].tolist() == [11, 12, 13]
+    assert replaces_last
+
+    # a stored bar between two fetched ones (the provider dropped it) is not replaced
+    bars, replaces_last = bars_since(df, timestamps[1] + 1)
+    assert bars["Close"].tolist() == [12, 13]
+    assert not replaces_last
+
+    bars, replaces_last = bars_since(df, timestamps[-1] + 1)
+    assert bars.empty and not replaces_last
+
+
+# CSV MIGRATION
+
+def test_migration_round_trips_the_csv_store(tmp_path):
+    data_dir = str(tmp_path)
+    csv_store = CsvPriceStore(data_dir)
+    csv_store.save("SAP.DE", "daily", to_price_frame(provider_frame("2025-03-03", [10, 11, 12])))
+    csv_store.save("BRK.B", "weekly", to_price_frame(provider_frame("2025-01-06", [400, 410])))
+
+    # a file as the old update_stock_database wrote it: running index column, provider date labels
+    legacy = provider_frame("2025-03-03", [5, 6]).rename_axis("Date").reset_index()
+    legacy.insert(0, "index", [1, 2])
+    legacy.to_csv(os.path.join(data_dir, "ASML_daily.csv"), index=False)
+
+    with open(os.path.join(data_dir, "notes.csv"), "w") as file:
+        file.write("not,prices\n")
+
+    migrated = migrate_csv_prices(data_dir, backend="columns")
+
+    assert sorted(migrated) == [("ASML", "daily"), ("BRK.B", "weekly"), ("SAP.DE", "daily")]
+    target = ColumnPriceStore(data_dir)
+    for stock, timeframe in migrated:
+        expected = csv_store.load(stock, timeframe)
+        pd.testing.assert_frame_equal(target.load(stock, timeframe), expected, check_like=True)
+        assert target.last_timestamp(stock, timeframe) == expected["Date"].iloc[-1]
+    assert target.load("ASML", "daily")["Close"].tolist() == [5, 6]
+
+def test_migration_can_remove_the_csv_files(tmp_path):
+    data_dir = str(tmp_path)
+    CsvPriceStore(data_dir).save("SAP.DE", "daily", to_price_frame(provider_frame("2025-03-03", [10, 11])))
+
+    migrate_csv_prices(data_dir, backend="columns", remove_csv=True)
+
+    assert not os.path.exists(os.path.join(data_dir, "SAP.DE_daily.csv"))
+    assert ColumnPriceStore(data_dir).load("SAP.DE", "daily")["Close"].tolist() == [10, 11]
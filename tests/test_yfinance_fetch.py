@@ -0,0 +1,98 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+from stockalerter import utils
+
+PRICES = {ticker: float(i + 1) for i, ticker in enumerate(["SAP.DE", "BMW.DE", "SIE.DE", "ALV.DE", "BAS.DE", "DTE.DE"])}
+
+
+class SharedStateDownloader:
+    """
+    Stands in for yf.download with its module-global bookkeeping: every call resets the shared results,
+    fills them ticker by ticker and builds its frame from them, so overlapping calls mix up their tickers
+    """
+    def __init__(self):
+        self.results = {}
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, tickers, group_by=None, session=None, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            self.results.clear()
+            for ticker in tickers:
+                time.sleep(0.01)
+                self.results[ticker] = PRICES[ticker]
+
+            index = pd.date_range("2025-03-10", periods=3, freq="B")
+            columns = {}
+            for ticker, price in list(self.results.items()):
+                for column in ["Open", "High", "Low", "Close", "Volume"]:
+                    columns[(ticker, column)] = np.full(len(index), price)
+            return pd.DataFrame(columns, index=index)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def test_concurrent_batches_keep_their_own_tickers(monkeypatch):
+    downloader = SharedStateDownloader()
+    monkeypatch.setattr(utils.yf, "download", downloader)
+
+    batches = [["SAP.DE", "BMW.DE", "SIE.DE"], ["ALV.DE", "BAS.DE", "DTE.DE"]]
+    frames = [None] * len(batches)
+
+    def fetch(i):
+        frames[i] = utils.grab_new_data_yfinance_batch(batches[i], start="2025-03-10")
+
+    threads = [threading.Thread(target=fetch, args=(i,)) for i in range(len(batches))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert downloader.max_active == 1
+    for batch, batch_frames in zip(batches, frames):
+        assert set(batch_frames) == set(batch)
+        for ticker, df in batch_frames.items():
+            assert (df["Close"] == PRICES[ticker]).all()
+
+
+# A year of daily bars, each call returns the first `available` of them from start on
+class HistoryDownloader:
+    def __init__(self, n=250, seed=3):
+        rng = np.random.default_rng(seed)
+        close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+        self.bars = pd.DataFrame({
+            "Open": close * 0.995, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+            "Volume": rng.integers(10**5, 10**6, n).astype(float),
+        }, index=pd.date_range("2024-06-03", periods=n, freq="B"))
+        self.available = n
+
+    def __call__(self, tickers, start=None, group_by=None, session=None, **kwargs):
+        bars = self.bars.iloc[:self.available]
+        if start is not None:
+            bars = bars[bars.index >= pd.Timestamp(start)]
+        tickers = [tickers] if isinstance(tickers, str) else tickers
+        return pd.concat({ticker: bars for ticker in tickers}, axis=1)
+
+def test_incremental_fetch_continues_the_stored_vwap(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    downloader = HistoryDownloader()
+    monkeypatch.setattr(utils.yf, "download", downloader)
+
+    full = utils.grab_new_data_yfinance_batch(["SAP.DE"])["SAP.DE"]
+
+    downloader.available = 200
+    utils.update_stock_database("SAP.DE", utils.grab_new_data_yfinance_batch(["SAP.DE"])["SAP.DE"], "daily")
+    downloader.available = 250
+    new = utils.get_latest_stock_data_batch(["SAP.DE"], "DE", "day")["SAP.DE"]
+    stored = utils.update_stock_database("SAP.DE", new, "daily")
+
+    # the appended bars carry on the cumulative VWAP of the whole history instead of restarting at the fetch
+    assert len(new) == 51
+    assert np.allclose(stored["VWAP"].to_numpy(), full["VWAP"].to_numpy(), atol=2e-3)
@@ -4,10 +4,15 @@ import datetime
 import pytz
 import pandas as pd
 from stockalerter.backend import check_alerts
+from stockalerter.pipeline import run_market_pipeline
+from stockalerter.alert_registry import AlertRegistry
+from stockalerter.http_pool import connection_stats
 from stockalerter.utils import *
 from stockalerter.indicators_lib import *
 import time
 import logging
+import threading
+from functools import lru_cache
 # Toggle debug mode
 IS_DEBUG = True
 
@@ -23,43 +28,46 @@ class ESTFormatter(logging.Formatter):
             return dt.strftime(datefmt)
         return dt.isoformat()
 
-# Set up logger
+# Set up in main(), evaluation workers started with spawn import this module again as __mp_main__
+# and must not open the log file, read the CSV, or load the alerts
 logger = logging.getLogger("StockUpdater")
-log_level = logging.DEBUG if IS_DEBUG else logging.INFO
-logger.setLevel(log_level)
+exchange_info = None
+scheduler = None
+alert_registry = None
 
-# Clear any existing handlers
-if logger.hasHandlers():
-    logger.handlers.clear()
+def setup_logging():
+    log_level = logging.DEBUG if IS_DEBUG else logging.INFO
+    logger.setLevel(log_level)
 
-# Define formatter with EST
-formatter = ESTFormatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    # Clear any existing handlers
+    if logger.hasHandlers():
+        logger.handlers.clear()
 
-# File handler (always logs everything)
-file_handler = logging.FileHandler("update_stocks.log")
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
+    # Define formatter with EST
+    formatter = ESTFormatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 
-# Console handler (respects debug toggle)
-console_handler = logging.StreamHandler()
-console_handler.setLevel(log_level)
-console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
+    # File handler (always logs everything)
+    file_handler = logging.FileHandler("update_stocks.log")
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
 
-logger.info("Starting update_stocks script...")
+    # Console handler (respects debug toggle)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(log_level)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
 
 # Load CSV
-
-try:
-    exchange_info = pd.read_csv("market_data.csv")
-    logger.debug("CSV 'market_data.csv' loaded successfully.")
-    logger.debug("CSV Columns: %s", exchange_info.columns.tolist())
-except Exception as e:
-    logger.error("Failed to load CSV file: %s", e)
-    exit(1)
-
-scheduler = BlockingScheduler(timezone=pytz.timezone("America/New_York"))
+def load_exchange_info():
+    try:
+        exchange_info = pd.read_csv("market_data.csv")
+        logger.debug("CSV 'market_data.csv' loaded successfully.")
+        logger.debug("CSV Columns: %s", exchange_info.columns.tolist())
+        return exchange_info
+    except Exception as e:
+        logger.error("Failed to load CSV file: %s", e)
+        exit(1)
 
 code_to_country = {
     "US": "USA",
@@ -100,13 +108,11 @@ def run_daily_stock_check_for_market(market_code):
     log_to_discord("\n")
     log_to_discord(f"📈 Running daily check for {market_code}...")
     
-    alert_data = load_alert_data()
-    logger.debug("Loaded alert data: %s", alert_data)
-
-    market_alerts = [alert for alert in alert_data if alert.get("exchange") == market_code and alert.get("timeframe") == "1d"]
-    logger.info("Found %d alerts for market '%s'.", len(market_alerts), market_code)
-    
-    stocks = {alert.get("ticker") for alert in market_alerts}
+    # a change picked up here would not reach the watcher any more, so the jobs reconcile it themselves
+    if alert_registry.refresh().changed:
+        reconcile_jobs()
+    stocks = alert_registry.tickers(market_code, "1d")
+    logger.info("Found %d stocks with daily alerts for market '%s'.", len(stocks), market_code)
     logger.debug("Unique stocks to process for market '%s': %s", market_code, stocks)
 
     if not stocks:
@@ -114,24 +120,9 @@ def run_daily_stock_check_for_market(market_code):
         return
 
     log_to_discord(f"📊 Processing {len(stocks)} stocks for {market_code}...")
-    successes, failures = [], []
-
-    for stock in stocks:
-        
-
-        log_to_discord(f"🔄 Updating {stock}... with new data")
-        logger.info("Updating stock: %s", stock)
-
-        new_stock_data = get_latest_stock_data(stock, market_code, timespan="day")
-        if new_stock_data.empty:
-            failures.append(stock)
-            continue
-        else:
-            successes.append(stock)
-
-        update_stock_database(stock, new_stock_data, timeframe="daily")
-        check_alerts(stock, alert_data, "daily")
+    successes, failures = run_market_pipeline(market_code, stocks, alert_registry, timespan="day", timeframe="daily")
     logger.info("📈 Summary for %s — Success: %s, Failed: %s", market_code, successes, failures)
+    logger.info("HTTP connections (opened / reused per host): %s", connection_stats())
 
     log_to_discord(f"✅ Completed daily check for {market_code}.")
     flush_logs_to_discord()
@@ -149,13 +140,10 @@ def run_weekly_stock_check_for_market(market_code):
     log_to_discord("\n")
     log_to_discord(f"📈 Running weekly check for {market_code}...")
     
-    alert_data = load_alert_data()
-    logger.debug("Loaded alert data for weekly check: %s", alert_data)
-
-    market_weekly_alerts = [alert for alert in alert_data if alert.get("exchange") == market_code and alert.get("timeframe") == "1wk"]
-    logger.info("Found %d weekly alerts for market '%s'.", len(market_weekly_alerts), market_code)
-    
-    stocks = {alert.get("ticker") for alert in market_weekly_alerts}
+    if alert_registry.refresh().changed:
+        reconcile_jobs()
+    stocks = alert_registry.tickers(market_code, "1wk")
+    logger.info("Found %d stocks with weekly alerts for market '%s'.", len(stocks), market_code)
     logger.debug("Unique stocks to process for weekly market '%s': %s", market_code, stocks)
 
     if not stocks:
@@ -163,172 +151,128 @@ def run_weekly_stock_check_for_market(market_code):
         return
 
     log_to_discord(f"📊 Processing {len(stocks)} stocks for weekly check in {market_code}...")
-    for stock in stocks:
-        log_to_discord(f"🔄 Updating weekly data for {stock}...")
-        logger.info("Updating weekly stock: %s", stock)
-
-        new_stock_data = get_latest_stock_data(stock, market_code, timespan="week")
-        if new_stock_data.empty:
-            log_to_discord(f"❌ No new weekly data for {stock}.")
-            logger.warning("No new weekly data returned for stock: %s", stock)
-            continue
-
-        update_stock_database(stock, new_stock_data, timeframe="weekly")
-        check_alerts(stock, alert_data, "weekly")
+    successes, failures = run_market_pipeline(market_code, stocks, alert_registry, timespan="week", timeframe="weekly")
+    logger.info("📈 Weekly summary for %s — Success: %s, Failed: %s", market_code, successes, failures)
+    logger.info("HTTP connections (opened / reused per host): %s", connection_stats())
 
     log_to_discord(f"✅ Completed weekly check for {market_code}.")
     flush_logs_to_discord()
 
 
-# Global variable to keep track of markets that have already been scheduled.
-scheduled_markets = set()
-scheduled_weekly_markets = set()
-
-logger.debug("code_to_country mapping: %s", code_to_country)
 
+# Minutes after the close a market is checked, giving the provider time to publish the final bar
+def market_run_offset(market_code):
+    return 15 if market_code == "US" else 20
 
-# Initial scheduling for daily market-specific checks
-alert_data = load_alert_data()
-logger.debug("Initially loaded alert data: %s", alert_data)
-
-daily_alerts = [alert for alert in alert_data if alert.get("timeframe") == "1d"]
-logger.info("Found %d daily alerts.", len(daily_alerts))
-markets = {alert.get("exchange") for alert in daily_alerts}
-logger.debug("Unique markets extracted for daily alerts: %s", markets)
-for market_code in markets:
+# Time (New York) a market's check runs at, None if its closing time is unknown
+# Closing times are fixed for the process, so each market is looked up once
+@lru_cache(maxsize=None)
+def market_run_time(market_code):
     country_name = code_to_country.get(market_code, market_code)
-    
     try:
         closing_time_str = exchange_info.loc[exchange_info["Country"] == country_name, "Closing Time (EST)"].iloc[0]
         logger.debug("For market '%s' (Country: %s), closing time string is: %s", market_code, country_name, closing_time_str)
     except Exception as e:
         logger.error("Unable to retrieve closing time for market '%s' (Country: %s): %s", market_code, country_name, e)
-        continue
+        return None
 
     try:
         closing_dt = datetime.datetime.strptime(closing_time_str.replace(" EST", ""), "%I:%M %p")
         logger.debug("Parsed closing_dt for market '%s': %s", market_code, closing_dt)
     except Exception as e:
         logger.error("Could not parse closing time for market '%s': %s", market_code, e)
-        continue
+        return None
 
     close_hour, close_min = closing_dt.hour, closing_dt.minute
-    offset = 15 if market_code == "US" else 20
+    offset = market_run_offset(market_code)
     run_hour = close_hour + ((close_min + offset) // 60)
     run_minute = (close_min + offset) % 60
+    return run_hour, run_minute
 
-    logger.info("Scheduling daily job for market '%s' at %d:%02d", market_code, run_hour, run_minute)
-    scheduler.add_job(run_daily_stock_check_for_market, 'cron', args=[market_code],
-                      day_of_week='mon-fri', hour=run_hour, minute=run_minute)
-    scheduled_markets.add(market_code)
 
-# Schedule weekly jobs for each market that has weekly alerts
-weekly_alerts = [alert for alert in alert_data if alert.get("timeframe") == "1wk"]
-logger.info("Found %d weekly alerts.", len(weekly_alerts))
-weekly_markets = {alert.get("exchange") for alert in weekly_alerts}
-for market_code in weekly_markets:
-    country_name = code_to_country.get(market_code, market_code)
-    
-    try:
-        closing_time_str = exchange_info.loc[exchange_info["Country"] == country_name, "Closing Time (EST)"].iloc[0]
-        logger.debug("For weekly market '%s' (Country: %s), closing time string is: %s", market_code, country_name, closing_time_str)
-    except Exception as e:
-        logger.error("Unable to retrieve closing time for weekly market '%s' (Country: %s): %s", market_code, country_name, e)
-        continue
+# SCHEDULER RECONCILIATION
+# The wanted jobs (one per market and timeframe with alerts) are derived from the alert registry and
+# diffed against the scheduled ones, so a change adds, removes and reschedules jobs in one pass
 
+# Alert timeframe -> (job function, cron days, label)
+TIMEFRAME_JOBS = {
+    "1d": (run_daily_stock_check_for_market, "mon-fri", "daily"),
+    "1wk": (run_weekly_stock_check_for_market, "fri", "weekly"),
+}
+
+# job id -> (hour, minute) of the market jobs currently scheduled
+scheduled_jobs = {}
+reconcile_lock = threading.Lock()
+
+def market_job_id(market_code, timeframe):
+    return f"{TIMEFRAME_JOBS[timeframe][2]}:{market_code}"
+
+def desired_jobs():
+    """
+    {job id: (market, timeframe, (hour, minute))} for every market and timeframe with at least one alert
+    """
+    jobs = {}
+    for timeframe in TIMEFRAME_JOBS:
+        for market_code in alert_registry.markets(timeframe):
+            run_time = market_run_time(market_code)
+            if run_time is not None:
+                jobs[market_job_id(market_code, timeframe)] = (market_code, timeframe, run_time)
+    return jobs
+
+def reconcile_jobs():
+    with reconcile_lock:
+        desired = desired_jobs()
+
+        for job_id in set(scheduled_jobs) - set(desired):
+            logger.info("Removing job '%s', its market has no alerts left", job_id)
+            scheduler.remove_job(job_id)
+            del scheduled_jobs[job_id]
+
+        for job_id, (market_code, timeframe, (run_hour, run_minute)) in desired.items():
+            func, days, label = TIMEFRAME_JOBS[timeframe]
+            if job_id not in scheduled_jobs:
+                logger.info("Scheduling %s job for market '%s' at %d:%02d", label, market_code, run_hour, run_minute)
+                scheduler.add_job(func, 'cron', args=[market_code], id=job_id, replace_existing=True,
+                                  day_of_week=days, hour=run_hour, minute=run_minute)
+            elif scheduled_jobs[job_id] != (run_hour, run_minute):
+                logger.info("Rescheduling %s job for market '%s' to %d:%02d", label, market_code, run_hour, run_minute)
+                scheduler.reschedule_job(job_id, trigger='cron', day_of_week=days, hour=run_hour, minute=run_minute)
+            scheduled_jobs[job_id] = (run_hour, run_minute)
+
+def on_alerts_changed(diff):
+    logger.info("Alerts changed (%d added, %d removed), reconciling jobs.", len(diff.added), len(diff.removed))
+    reconcile_jobs()
+
+
+def main():
+    global exchange_info, scheduler, alert_registry
+    setup_logging()
+    logger.info("Starting update_stocks script...")
+
+    exchange_info = load_exchange_info()
+    scheduler = BlockingScheduler(timezone=pytz.timezone("America/New_York"))
+    logger.debug("code_to_country mapping: %s", code_to_country)
+
+    # Alerts stay in memory, indexed by market and ticker, and are re-read only when the alert store changes
+    alert_registry = AlertRegistry()
+    logger.info("Loaded %d alerts.", len(alert_registry.all()))
+
+    reconcile_jobs()
+
+    # reconciles only when the alert store changes, nothing runs while the alerts stay the same
+    alert_registry.watch(on_alerts_changed)
+
+    logger.info("Scheduled Jobs:")
+    scheduler.print_jobs()
+
+    logger.info("Starting scheduler...")
     try:
-        closing_dt = datetime.datetime.strptime(closing_time_str.replace(" EST", ""), "%I:%M %p")
-        logger.debug("Parsed closing_dt for weekly market '%s': %s", market_code, closing_dt)
-    except Exception as e:
-        logger.error("Could not parse closing time for weekly market '%s': %s", market_code, e)
-        continue
+        logger.info("⏰ Scheduler running. Press Ctrl+C to exit.")
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("🛑 Scheduler shutting down.")
+        scheduler.shutdown()
 
-    close_hour, close_min = closing_dt.hour, closing_dt.minute
-    offset = 15 if market_code == "US" else 20
-    run_hour = close_hour + ((close_min + offset) // 60)
-    run_minute = (close_min + offset) % 60
 
-    logger.info("Scheduling weekly job for market '%s' at %d:%02d", market_code, run_hour, run_minute)
-    scheduler.add_job(run_weekly_stock_check_for_market, 'cron', args=[market_code],
-                      day_of_week='fri', hour=run_hour, minute=run_minute)
-    scheduled_weekly_markets.add(market_code)
-
-
-# Function to dynamically add daily jobs for markets not already scheduled.
-def dynamic_market_scheduler():
-    logger.debug("Running dynamic market scheduler...")
-    alert_data = load_alert_data()
-    new_markets = {alert.get("exchange") for alert in alert_data if alert.get("timeframe") == "1d"}
-    logger.debug("dynamic_market_scheduler: found markets: %s", new_markets)
-    for market in new_markets:
-        if market not in scheduled_markets:
-            logger.info("Dynamic scheduling: Adding daily job for new market: %s", market)
-            country_name = code_to_country.get(market, market)
-            try:
-                closing_time_str = exchange_info.loc[exchange_info["Country"] == country_name, "Closing Time (EST)"].iloc[0]
-                logger.debug("For dynamic market '%s' (Country: %s), closing time string is: %s", market, country_name, closing_time_str)
-            except Exception as e:
-                logger.error("Unable to retrieve closing time for dynamic market '%s' (Country: %s): %s", market, country_name, e)
-                continue
-
-            try:
-                closing_dt = datetime.datetime.strptime(closing_time_str.replace(" EST", ""), "%I:%M %p")
-                logger.debug("Parsed closing_dt for dynamic market '%s': %s", market, closing_dt)
-            except Exception as e:
-                logger.error("Could not parse closing time for dynamic market '%s': %s", market, e)
-                continue
-
-            close_hour, close_min = closing_dt.hour, closing_dt.minute
-            offset = 15 if market == "US" else 20
-            run_hour = close_hour + ((close_min + offset) // 60)
-            run_minute = (close_min + offset) % 60
-            logger.info("✔️ Daily job for %s scheduled at %02d:%02d", market, run_hour, run_minute)
-            scheduler.add_job(run_daily_stock_check_for_market, 'cron', args=[market],
-                              day_of_week='mon-fri', hour=run_hour, minute=run_minute)
-            scheduled_markets.add(market)
-    
-    new_markets_weekly = {alert.get("exchange") for alert in alert_data if alert.get("timeframe") == "1wk"}
-    for market in new_markets_weekly:
-        if market not in scheduled_weekly_markets:
-            logger.info("Dynamic scheduling: Adding weekly job for new market: %s", market)
-            country_name = code_to_country.get(market, market)
-            try:
-                closing_time_str = exchange_info.loc[exchange_info["Country"] == country_name, "Closing Time (EST)"].iloc[0]
-                logger.debug("For dynamic weekly market '%s' (Country: %s), closing time string is: %s", market, country_name, closing_time_str)
-            except Exception as e:
-                logger.error("Unable to retrieve closing time for dynamic weekly market '%s' (Country: %s): %s", market, country_name, e)
-                continue
-
-            try:
-                closing_dt = datetime.datetime.strptime(closing_time_str.replace(" EST", ""), "%I:%M %p")
-                logger.debug("Parsed closing_dt for dynamic weekly market '%s': %s", market, closing_dt)
-            except Exception as e:
-                logger.error("Could not parse closing time for dynamic weekly market '%s': %s", market, e)
-                continue
-
-            close_hour, close_min = closing_dt.hour, closing_dt.minute
-            offset = 15 if market == "US" else 20
-            run_hour = close_hour + ((close_min + offset) // 60)
-            run_minute = (close_min + offset) % 60
-
-            logger.info("Dynamically scheduling weekly job for market '%s' at %d:%02d", market, run_hour, run_minute)
-            scheduler.add_job(run_weekly_stock_check_for_market, 'cron', args=[market],
-                              day_of_week='fri', hour=run_hour, minute=run_minute)
-            scheduled_weekly_markets.add(market)
-
-
-# Schedule the dynamic market scheduler to run every minute
-scheduler.add_job(dynamic_market_scheduler, 'interval', minutes=1)
-
-logger.info("Scheduled Jobs:")
-scheduler.print_jobs()
-
-
-
-logger.info("Starting scheduler...")
-try:
-    logger.info("⏰ Scheduler running. Press Ctrl+C to exit.")
-    scheduler.start()
-except (KeyboardInterrupt, SystemExit):
-    logger.info("🛑 Scheduler shutting down.")
-    scheduler.shutdown()
+if __name__ == "__main__":
+    main()
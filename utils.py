@@ -8,14 +8,25 @@ from datetime import timezone
 import yfinance as yf
 import numpy as np
 import os
+import sys
+import threading
 import uuid
 from stockalerter.indicators_lib import *
+from stockalerter.price_store import get_price_store, to_price_frame
+from stockalerter.streaming import advance_indicator_state
+from stockalerter.discord_delivery import get_discord_delivery
+from stockalerter.http_pool import get_http_session, pool_polygon_client
+from stockalerter.alert_syntax import validate_combination
+from stockalerter.alert_store import ALERTS_FILE_PATH, JsonAlertStore, get_alert_store, alert_fingerprint
 import requests
 import time
 import operator
 
 
 MAX_DISCORD_MESSAGE_LENGTH = 2000
+# Discord caps a message at 10 embeds and 6000 characters of embed text
+MAX_DISCORD_EMBEDS = 10
+MAX_DISCORD_EMBED_LENGTH = 6000
 POLY_API_KEY = os.getenv("POLYGON_API_KEY")
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 WEBHOOK_URL_2 = os.getenv("WEBHOOK_URL_2")
@@ -29,16 +40,19 @@ LOG_BUFFER = []
 if not POLY_API_KEY:
     raise ValueError("API key not found! Set the POLYGON_API_KEY environment variable.")
 
+# Base URL of the Polygon REST API, point it at a local server replaying recorded responses to run without the network
+POLYGON_API_BASE = os.getenv("POLYGON_API_BASE", "https://api.polygon.io")
+
+# Daily US runs fetch the latest bar of every ticker with one grouped daily request ("0" fetches per ticker)
+POLYGON_GROUPED_DAILY = os.getenv("POLYGON_GROUPED_DAILY", "1") == "1"
+
 # Initialize REST Client with the secured API key
-client = RESTClient(api_key=POLY_API_KEY)
+client = pool_polygon_client(RESTClient(api_key=POLY_API_KEY, base=POLYGON_API_BASE))
 
 
 # Path to CSV file for storing exchange and stock data
 CSV_FILE_PATH = "cleaned_data.csv"
 
-# Path to CSV file for storing stock alerts
-ALERTS_FILE_PATH = "alerts.json"
-
 # Function to load stock exchange and ticker data from a CSV file
 def load_market_data():
     if os.path.exists(CSV_FILE_PATH):
@@ -116,50 +130,33 @@ def split_message(message, max_length):
     return chunks
 
 # Function to flush log buffer to Discord
+# The chunks are queued for the background delivery worker, which posts them to both logging webhooks
+# concurrently and paces itself by Discord's rate limit headers, so the market job returns right away
 def flush_logs_to_discord():
     global LOG_BUFFER
     if not LOG_BUFFER:
         return
 
     full_message = "\n".join(LOG_BUFFER)
-    messages = split_message(full_message, MAX_DISCORD_MESSAGE_LENGTH)
-
-    for msg in messages:
-        payload = {"content": msg}
-        try:
-            response = requests.post(WEBHOOK_URL_LOGGING, json=payload)
-            response.raise_for_status()
-            time.sleep(5)  # Delay to respect rate limits
-        except requests.exceptions.RequestException as e:
-            print(f"Failed to send Discord message: {e}")
-            break  # Exit on failure to prevent flooding
-        try:
-            response_2 = requests.post(WEBHOOK_URL_LOGGING_2, json=payload)
-            response_2.raise_for_status()
-            time.sleep(5)  # Delay to respect rate limits
-        except requests.exceptions.RequestException as e:
-            print(f"Failed to send Discord message: {e}")
-            break  # Exit on failure to prevent flooding
-
-    LOG_BUFFER.clear()  # Clear buffer after successful sends
+    payloads = [{"content": msg} for msg in split_message(full_message, MAX_DISCORD_MESSAGE_LENGTH)]
 
-# Function to fetch stock data using Polygon API
-def grab_new_data_polygon(ticker, timespan = "day", multiplier = 1):
+    delivery = get_discord_delivery()
+    delivery.send("WEBHOOK_URL_LOGGING", payloads)
+    delivery.send("WEBHOOK_URL_LOGGING_2", payloads)
 
-    today = datetime.datetime.today().strftime('%Y-%m-%d')
-    last_year = (datetime.datetime.now() - datetime.timedelta(days=365)).strftime('%Y-%m-%d')
+    LOG_BUFFER.clear()  # Clear buffer once queued, undelivered chunks are spooled by the worker
 
-    aggs = cast(
-        HTTPResponse,
-        client.get_aggs(ticker=ticker, multiplier=1, timespan=timespan, from_=last_year, to=today, raw=True),
-    )
-
-    data_str = aggs.data.decode("utf-8")
-    data = json.loads(data_str)
-    df = pd.DataFrame(data["results"])
+# Turns Polygon aggregate results into a frame indexed by formatted New York dates
+# normalize_dates moves every bar to midnight New York time (grouped daily bars are stamped at the close)
+def polygon_results_to_frame(results, normalize_dates=False):
+    if not results:
+        return pd.DataFrame()
+    df = pd.DataFrame(results)
 
     df.sort_values(by="t", ascending=True, inplace=True)
     df["Date"] = pd.to_datetime(df["t"], unit="ms", utc=True).dt.tz_convert("America/New_York")
+    if normalize_dates:
+        df["Date"] = df["Date"].dt.normalize()
     df["Date"] = df["Date"].dt.strftime("%d-%m-%Y %H:%M:%S %Z")
 
     df.rename(columns={
@@ -178,15 +175,72 @@ def grab_new_data_polygon(ticker, timespan = "day", multiplier = 1):
 
     return df
 
+# New York calendar date ("%Y-%m-%d") of a price store timestamp
+def market_date(timestamp):
+    return pd.Timestamp(timestamp, tz="UTC").tz_convert("America/New_York").strftime('%Y-%m-%d')
+
+# Function to fetch stock data using Polygon API
+# since (a price store timestamp) limits the request to the bars from that date on, otherwise the last year is fetched
+def grab_new_data_polygon(ticker, timespan = "day", multiplier = 1, since = None):
+
+    today = datetime.datetime.today().strftime('%Y-%m-%d')
+    last_year = (datetime.datetime.now() - datetime.timedelta(days=365)).strftime('%Y-%m-%d')
+    start = market_date(since) if since is not None else last_year
+
+    aggs = cast(
+        HTTPResponse,
+        client.get_aggs(ticker=ticker, multiplier=1, timespan=timespan, from_=start, to=today, raw=True),
+    )
+
+    data_str = aggs.data.decode("utf-8")
+    data = json.loads(data_str)
+
+    return polygon_results_to_frame(data.get("results"))
+
+# Fetch the daily bar of every US ticker with a single grouped daily request, returns {ticker: frame}
+# for the requested tickers that traded on that date (defaults to today in New York)
+def grab_grouped_daily_polygon(tickers, date=None):
+    date = date or pd.Timestamp.now(tz="America/New_York").strftime('%Y-%m-%d')
+
+    aggs = cast(
+        HTTPResponse,
+        client.get_grouped_daily_aggs(date=date, adjusted=True, raw=True),
+    )
+
+    data_str = aggs.data.decode("utf-8")
+    data = json.loads(data_str)
+    results = data.get("results") or []
+
+    wanted = set(tickers)
+    results = [bar for bar in results if bar.get("T") in wanted]
+    if not results:
+        return {}
+
+    df = polygon_results_to_frame(results, normalize_dates=True)
+    return {ticker: bar.drop(columns=["T"]) for ticker, bar in df.groupby("T")}
 
-# Function to fetch stock data using Polygon API, works for international stocks too
-def grab_new_data_yfinance(ticker, timespan="1d", period="1y"):
-    # download fresh data
-    df = yf.download(ticker,
-                     period=period,
-                     interval=timespan,
-                     auto_adjust=True,
-                     progress=False)
+
+# Number of tickers requested per yf.download call in batch mode
+YFINANCE_CHUNK_SIZE = int(os.getenv("YFINANCE_CHUNK_SIZE", "50"))
+
+# yf.download collects its results in module globals that every call resets, so two calls at once
+# (pipeline batches, markets running together, the app) mix up or lose each other's tickers
+_YF_LOCK = threading.Lock()
+
+# yf.download, one call at a time (each call still downloads its tickers on yfinance's own threads)
+def download_yfinance(tickers, **kwargs):
+    with _YF_LOCK:
+        return yf.download(tickers, session=get_http_session("yfinance"), **kwargs)
+
+# Turns one ticker's yf.download columns into the frame stored for it (VWAP added, prices rounded)
+# VWAP is cumulative from the first stored bar, carry holds the (TP * Volume, Volume) sums of the
+# stored bars before df so an incremental fetch continues the stored VWAP instead of restarting it
+def prepare_yfinance_frame(df, ticker, carry=(0.0, 0.0)):
+    # yf.download returns (Price, Ticker) or (Ticker, Price) columns, keep only this ticker's prices
+    if isinstance(df.columns, pd.MultiIndex):
+        level = 0 if ticker in df.columns.get_level_values(0) else 1
+        df = df.xs(ticker, axis=1, level=level)
+    df = df.dropna(how="all").copy()
 
     # if you somehow have old helper columns, drop them first:
     for col in ["Typical Price", "TP * Volume", "Cumulative TP * Volume", 
@@ -202,8 +256,8 @@ def grab_new_data_yfinance(ticker, timespan="1d", period="1y"):
     df["TP * Volume"] = tp * df["Volume"]
 
     # cumulative sums
-    df["Cumulative TP * Volume"] = df["TP * Volume"].cumsum()
-    df["Cumulative Volume"]       = df["Volume"].cumsum()
+    df["Cumulative TP * Volume"] = carry[0] + df["TP * Volume"].cumsum()
+    df["Cumulative Volume"]       = carry[1] + df["Volume"].cumsum()
 
     # VWAP
     df["VWAP"] = df["Cumulative TP * Volume"] / df["Cumulative Volume"]
@@ -220,6 +274,45 @@ def grab_new_data_yfinance(ticker, timespan="1d", period="1y"):
 
     return out
 
+# Function to fetch stock data using Polygon API, works for international stocks too
+# start ("%Y-%m-%d") fetches the bars from that date on instead of the whole period, carry continues the stored VWAP
+def grab_new_data_yfinance(ticker, timespan="1d", period="1y", start=None, carry=(0.0, 0.0)):
+    # download fresh data
+    df = download_yfinance(ticker,
+                           period=None if start else period,
+                           start=start,
+                           interval=timespan,
+                           auto_adjust=True,
+                           progress=False)
+
+    return prepare_yfinance_frame(df, ticker, carry)
+
+# Fetches many tickers with one yf.download call per chunk, returns {ticker: frame}
+# Tickers yfinance returned no data for are left out, carries holds the stored VWAP sums per ticker
+def grab_new_data_yfinance_batch(tickers, timespan="1d", period="1y", chunk_size=None, start=None, carries=None):
+    carries = carries or {}
+    chunk_size = chunk_size or YFINANCE_CHUNK_SIZE
+    frames = {}
+
+    for i in range(0, len(tickers), chunk_size):
+        chunk = list(tickers[i:i + chunk_size])
+        df = download_yfinance(chunk,
+                               period=None if start else period,
+                               start=start,
+                               interval=timespan,
+                               auto_adjust=True,
+                               group_by="ticker",
+                               progress=False)
+
+        for ticker in chunk:
+            if df.empty or ticker not in df.columns.get_level_values(0):
+                continue
+            out = prepare_yfinance_frame(df, ticker, carries.get(ticker, (0.0, 0.0)))
+            if not out.empty:
+                frames[ticker] = out
+
+    return frames
+
 def validate_conditions(entry_conditions_list):
     print("Validating conditions...")
     for entry in entry_conditions_list:
@@ -237,13 +330,7 @@ def validate_conditions(entry_conditions_list):
 #Save an alert with multiple entry conditions as a JSON object in alerts.csv
 def save_alert(name,entry_conditions_list, combination_logic, ticker, stock_name, exchange,timeframe,last_triggered, action):
     alert_id = str(uuid.uuid4())  
-    # Load existing alerts if the JSON file exists
-    try:
-        with open(ALERTS_FILE_PATH, "r") as file:
-            alerts = json.load(file)
-
-    except (FileNotFoundError, json.JSONDecodeError):
-        alerts = []  
+    store = get_alert_store()
     
     #if conditions are empty, return an error
     if not entry_conditions_list or ticker == "" or stock_name == "" or entry_conditions_list[0].get("conditions",[]) == []:
@@ -251,11 +338,10 @@ def save_alert(name,entry_conditions_list, combination_logic, ticker, stock_name
     
     if validate_conditions(entry_conditions_list) == False:
         raise ValueError("Invalid conditions provided.")
-    
-    for alert in alerts:
-        if alert["stock_name"] == stock_name and alert["ticker"] == ticker and alert["conditions"] == entry_conditions_list and alert["combination_logic"] == combination_logic and alert["exchange"] == exchange and alert["timeframe"] == timeframe:
-            raise ValueError("Alert already exists with the same data fields.")
 
+    # parsed once here so a malformed combination is rejected before it reaches the alert checks
+    validate_combination(combination_logic, len(entry_conditions_list))
+    
     new_alert = {
         "alert_id": alert_id,
         "name": name,  # Added name field
@@ -269,23 +355,21 @@ def save_alert(name,entry_conditions_list, combination_logic, ticker, stock_name
         "exchange": exchange
     }
 
-    
-
-    # Append the new alert
-    alerts.append(new_alert)
-
-    # Save back to the file
-    with open(ALERTS_FILE_PATH, "w") as file:
-        json.dump(alerts, file, indent=4)
+    # Append the new alert, a single insert with the SQLite store. The store rejects a duplicate
+    # (same fingerprint) itself, in the same step as the insert
+    new_alert["fingerprint"] = alert_fingerprint(new_alert)
+    store.add(new_alert)
 
     print(f"Alert {alert_id} saved successfully.")
 
 
 ## FOR update_stocks.py ONLY
 # Load alert data from JSON file
-def load_alert_data():
-    with open("alerts.json", "r") as file:
-        return json.load(file)
+def load_alert_data(path=None):
+    # an explicit path always reads that JSON file, otherwise the configured store
+    if path is not None:
+        return JsonAlertStore(path).load()
+    return get_alert_store().load()
 
 
 # Get all unique stock tickers from alert data
@@ -300,73 +384,123 @@ def get_stock_exchange(alert_data, stock):
 def get_all_alerts_for_stock(alert_data, stock):
     return [alert for alert in alert_data if alert['ticker'] == stock]
 
+# (TP * Volume, Volume) summed over the stored bars before start ("%Y-%m-%d"), what a yfinance
+# fetch from start needs to carry on the stored cumulative VWAP
+def stored_vwap_carry(stock, timeframe, start):
+    if start is None:
+        return (0.0, 0.0)
+    df = get_price_store().load(stock, timeframe)
+    if df is None or df.empty:
+        return (0.0, 0.0)
+
+    before = df[df["Date"] < pd.Timestamp(start, tz="America/New_York").value]
+    tp = (before["High"] + before["Low"] + before["Close"]) / 3
+    return (float(np.nansum(tp * before["Volume"])), float(np.nansum(before["Volume"])))
+
 # Fetch the latest stock data
-def get_latest_stock_data(stock, exchange, timespan):
+# since (a price store timestamp) limits the fetch to the bars from that timestamp on
+def get_latest_stock_data(stock, exchange, timespan, since=None):
     if exchange == "US":
-        df = grab_new_data_polygon(stock, timespan=timespan, multiplier=1)
+        df = grab_new_data_polygon(stock, timespan=timespan, multiplier=1, since=since)
     else:
         if timespan == "day":
             timespan_yfinance = "1d"
         elif timespan == "week":
             timespan_yfinance = "1wk"
-        df = grab_new_data_yfinance(stock, timespan=timespan_yfinance, period="1y")
+        start = market_date(since) if since is not None else None
+        carry = stored_vwap_carry(stock, "daily" if timespan == "day" else "weekly", start)
+        df = grab_new_data_yfinance(stock, timespan=timespan_yfinance, period="1y", start=start, carry=carry)
     return df
 
+# New York date ("%Y-%m-%d") of the weekday before date (today by default), the session a ticker
+# must already have stored for the grouped request (which only returns date's bar) to leave no gap.
+# Holidays are not known here, a ticker whose last bar is from before one just fetches per ticker
+def previous_session_date(date=None):
+    date = pd.Timestamp(date) if date is not None else pd.Timestamp.now(tz="America/New_York").tz_localize(None)
+    return (date.normalize() - pd.offsets.BDay(1)).strftime('%Y-%m-%d')
+
+# How many tickers of an exchange are fetched together by get_latest_stock_data_batch
+def fetch_batch_size(exchange, timespan="day"):
+    if exchange == "US":
+        # one grouped daily request covers the whole market
+        return sys.maxsize if timespan == "day" and POLYGON_GROUPED_DAILY else 1
+    return YFINANCE_CHUNK_SIZE
+
+# Fetch the latest data of several stocks from one exchange, returns {ticker: frame}
+# Stocks already in the price store only fetch the bars since their last stored one
+# Stocks without data are left out
+def get_latest_stock_data_batch(stocks, exchange, timespan):
+    store = get_price_store()
+    timeframe = "daily" if timespan == "day" else "weekly"
+    since = {stock: store.last_timestamp(stock, timeframe) for stock in stocks}
+    frames = {}
+
+    if exchange == "US":
+        per_ticker = list(stocks)
+
+        if timespan == "day" and POLYGON_GROUPED_DAILY:
+            # stocks only missing the newest bar come from one grouped request, the others (new, or behind
+            # after a missed run) fetch per ticker from their last stored bar so no session is skipped
+            previous_session = previous_session_date()
+            grouped = [stock for stock in stocks if since[stock] is not None and market_date(since[stock]) >= previous_session]
+            per_ticker = [stock for stock in stocks if stock not in grouped]
+            if grouped:
+                frames.update(grab_grouped_daily_polygon(grouped))
+
+        for stock in per_ticker:
+            df = get_latest_stock_data(stock, exchange, timespan, since=since[stock])
+            if not df.empty:
+                frames[stock] = df
+        return frames
+
+    # one batch per start date, stocks updated on the same day share it
+    timespan_yfinance = "1d" if timespan == "day" else "1wk"
+    by_start = {}
+    for stock in stocks:
+        start = market_date(since[stock]) if since[stock] is not None else None
+        by_start.setdefault(start, []).append(stock)
+
+    for start, batch in by_start.items():
+        carries = {stock: stored_vwap_carry(stock, timeframe, start) for stock in batch}
+        frames.update(grab_new_data_yfinance_batch(batch, timespan=timespan_yfinance, period="1y", start=start, carries=carries))
+    return frames
 
 # Load or create the historical database for a stock
 def check_database(stock,timeframe):
-    file_path = f"data/{stock}_{timeframe}.csv"
+    store = get_price_store()
 
-    if not os.path.exists(file_path):
+    if not store.exists(stock, timeframe):
         print(f"📥 No existing data for {stock}, fetching new data...")
         exchange = get_stock_exchange(load_alert_data(), stock)
-        timeframe = "day" if timeframe == "daily" else "week"
-        df = get_latest_stock_data(stock, exchange,timeframe)
-        df.reset_index(inplace=True)  # Move Date index to a column
-        df.insert(0, "index", range(1, len(df) + 1))
-        df.to_csv(file_path, index=False, date_format="%Y-%m-%d")
+        timespan = "day" if timeframe == "daily" else "week"
+        df = to_price_frame(get_latest_stock_data(stock, exchange, timespan))
+        store.save(stock, timeframe, df)
         return df
 
     else:
-        df = pd.read_csv(file_path)
-        # Drop any extra unnamed columns that may have been added in previous runs
-        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-        # Ensure that if an "index" column exists, it is of integer type; if not, create one.
-        if 'index' in df.columns:
-            df['index'] = df['index'].astype(int)
-        else:
-            df.insert(0, "index", range(1, len(df) + 1))
-        return df
+        return store.load(stock, timeframe)
 
     
 
 def update_stock_database(stock, new_stock_data,timeframe):
-    file_path = f"data/{stock}_{timeframe}.csv"
-    
-    # Load existing data
-    existing_data = check_database(stock,timeframe)
-
-    # Ensure new_stock_data has the same structure
-    new_stock_data.reset_index(inplace=True)  # Convert Date index to column
-    new_stock_data = new_stock_data[~new_stock_data["Date"].isin(existing_data["Date"])]
-
-    df_combined = pd.concat([existing_data, new_stock_data])
-    df_combined.reset_index(drop=True, inplace=True)
-        
-    # Regenerate the "index" column to be consistent
-    df_combined['index'] = range(1, len(df_combined) + 1)
-    cols = df_combined.columns.tolist()
-    if 'index' in cols:
-        cols.insert(0, cols.pop(cols.index('index')))
-    df_combined = df_combined[cols]
-    
-    # Save the combined data consistently without using pandas' default index
-    df_combined.to_csv(file_path, index=False, date_format="%Y-%m-%d")
-    
-    return df_combined
+    """
+    Appends the bars of new_stock_data newer than the stored history (the stored last bar is
+    replaced when it comes back, it may have been partial) and returns the updated history
+    """
+    store = get_price_store()
+
+    written = store.append(stock, timeframe, to_price_frame(new_stock_data))
+    print(f"💾 Stored {written} new bar(s) for {stock} ({timeframe})")
+
+    # streamed indicators advance by the new bars instead of being recomputed at the next alert check
+    df = store.load(stock, timeframe)
+    advance_indicator_state(stock, timeframe, df)
+    return df
 
     
-def send_alert(stock, alert, condition_str, df):
+# embeds is the triggered alert list of a market run, flushed batched at its end by flush_alerts_to_discord
+# Without one the alert is queued for delivery on its own right away
+def send_alert(stock, alert, condition_str, df, embeds=None):
     # Ensure the condition_str is actually a string
     if not isinstance(condition_str, str):
         print(f"[Alert Check] Provided condition is not a string: {condition_str}")
@@ -376,17 +510,19 @@ def send_alert(stock, alert, condition_str, df):
     # Add action to the alert
     action = alert['action']
     timeframe = alert['timeframe']
-    # Send the alert via Discord
-    send_stock_alert(WEBHOOK_URL, timeframe, alert["name"], stock, condition_str,current_price, action)
-    send_stock_alert(WEBHOOK_URL_2, timeframe, alert["name"], stock, condition_str,current_price, action)
+    embed = stock_alert_embed(timeframe, alert["name"], stock, condition_str, current_price, action)
+    if embeds is None:
+        flush_alerts_to_discord([embed])
+    else:
+        embeds.append(embed)
     log_to_discord(f"[Alert Triggered] '{alert['name']}' for {stock}: condition '{condition_str}' at {datetime.datetime.now()}.")
 
 
-def send_stock_alert(webhook_url, timeframe,alert_name, ticker, triggered_condition, current_price, action):
+def stock_alert_embed(timeframe, alert_name, ticker, triggered_condition, current_price, action):
     # Change the color based on the action
     color = 0x00ff00 if action == "Buy" else 0xff0000
     timeframe = "Daily" if timeframe == "1d" else "Weekly"
-    embed = {
+    return {
         "title": f"📈 {timeframe} Alert Triggered: {alert_name} ({ticker})",
         "description": f"The condition **{triggered_condition}** was triggered. \n Action: {action}",
         "fields": [
@@ -400,12 +536,45 @@ def send_stock_alert(webhook_url, timeframe,alert_name, ticker, triggered_condit
         "timestamp": datetime.datetime.now(timezone.utc).isoformat()
         }
 
+def embed_length(embed):
+    return len(embed.get("title", "")) + len(embed.get("description", "")) + sum(
+        len(field["name"]) + len(field["value"]) for field in embed.get("fields", []))
+
+# Packs embeds into as few messages as Discord allows
+def batch_embeds(embeds, max_embeds=MAX_DISCORD_EMBEDS, max_length=MAX_DISCORD_EMBED_LENGTH):
+    batches = []
+    current, length = [], 0
+    for embed in embeds:
+        if current and (len(current) == max_embeds or length + embed_length(embed) > max_length):
+            batches.append(current)
+            current, length = [], 0
+        current.append(embed)
+        length += embed_length(embed)
+    if current:
+        batches.append(current)
+    return batches
+
+# Function to flush the triggered alerts of a run to Discord
+# Up to 10 alerts go in one message, queued for the delivery worker which posts to every alert webhook concurrently
+def flush_alerts_to_discord(embeds):
+    if not embeds:
+        return
+
+    payloads = [{"embeds": batch} for batch in batch_embeds(embeds)]
+    delivery = get_discord_delivery()
+    delivery.send("WEBHOOK_URL", payloads)
+    delivery.send("WEBHOOK_URL_2", payloads)
+    print(f"Queued {len(embeds)} alert(s) in {len(payloads)} message(s)")
+
+
+def send_stock_alert(webhook_url, timeframe,alert_name, ticker, triggered_condition, current_price, action):
+    # Posts a single alert right away, alert checks batch theirs through send_alert / flush_alerts_to_discord
     payload = {
-        "embeds": [embed]
+        "embeds": [stock_alert_embed(timeframe, alert_name, ticker, triggered_condition, current_price, action)]
     }
 
     try:
-        response = requests.post(webhook_url, json=payload)
+        response = get_http_session().post(webhook_url, json=payload)
         if response.status_code == 204:
             print("Alert sent successfully!")
         else: